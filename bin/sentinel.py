@@ -5,9 +5,10 @@ sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../lib
 import init
 import config
 import misc
-from dynamicd import DynamicDaemon
+from dynamicd import DynamicDaemon, RECONNECT_ERRORS
 from models import Superblock, Proposal, GovernanceObject, Watchdog
-from models import VoteSignals, VoteOutcomes, Transient
+from models import VoteSignals, VoteOutcomes, Transient, vote_index
+from governance_class import GovernanceClass
 import socket
 from misc import printdbg
 import time
@@ -16,7 +17,11 @@ import signal
 import atexit
 import random
 from scheduler import Scheduler
+from zmq_listener import ZMQListener
+from vote_dispatcher import VoteDispatcher
+from db_pool import release_connection
 import argparse
+import peewee
 
 
 # sync dynamicd gobject list with our local relational DB backend
@@ -24,14 +29,39 @@ def perform_dynamicd_object_sync(dynamicd):
     GovernanceObject.sync(dynamicd)
 
 
+# objects we haven't voted on locally may need their network vote synced if
+# voting fails, so fetch those votes for all of them in one batch request
+def prefetch_network_votes(dynamicd, objects, signal):
+    object_hashes = [obj.object_hash for obj in objects if not obj.voted_on(signal=signal)]
+
+    concurrent = dynamicd.concurrent()
+    if concurrent:
+        concurrent.run(concurrent.prefetch_my_gobject_votes(object_hashes))
+    else:
+        dynamicd.prefetch_my_gobject_votes(object_hashes)
+
+
+# votes is a list of independent (object, signal, outcome) votes, queued and
+# then submitted along with any earlier votes still waiting to be retried
+def cast_votes(dynamicd, votes):
+    dispatcher = VoteDispatcher.from_config(dynamicd)
+    for (obj, signal, outcome) in votes:
+        dispatcher.enqueue(obj.go, signal, outcome)
+    dispatcher.dispatch()
+
+
 # delete old watchdog objects, create new when necessary
 def watchdog_check(dynamicd):
     printdbg("in watchdog_check")
 
     # delete expired watchdogs
-    for wd in Watchdog.expired(dynamicd):
+    expired_wd = list(Watchdog.expired(dynamicd))
+    prefetch_network_votes(dynamicd, expired_wd, VoteSignals.delete)
+    votes = []
+    for wd in expired_wd:
         printdbg("\tFound expired watchdog [%s], voting to delete" % wd.object_hash)
-        wd.vote(dynamicd, VoteSignals.delete, VoteOutcomes.yes)
+        votes.append((wd, VoteSignals.delete, VoteOutcomes.yes))
+    cast_votes(dynamicd, votes)
 
     # now, get all the active ones...
     active_wd = Watchdog.active(dynamicd)
@@ -49,13 +79,15 @@ def watchdog_check(dynamicd):
 
         # highest hash wins
         winner = wd_list.pop()
+        prefetch_network_votes(dynamicd, wd_list, VoteSignals.delete)
         printdbg("\tFound winning watchdog [%s], voting VALID" % winner.object_hash)
-        winner.vote(dynamicd, VoteSignals.valid, VoteOutcomes.yes)
+        votes = [(winner, VoteSignals.valid, VoteOutcomes.yes)]
 
         # if remaining Watchdogs exist in the list, vote delete
         for wd in wd_list:
             printdbg("\tFound losing watchdog [%s], voting DELETE" % wd.object_hash)
-            wd.vote(dynamicd, VoteSignals.delete, VoteOutcomes.yes)
+            votes.append((wd, VoteSignals.delete, VoteOutcomes.yes))
+        cast_votes(dynamicd, votes)
 
     printdbg("leaving watchdog_check")
 
@@ -80,9 +112,10 @@ def attempt_superblock_creation(dynamicd):
         # printdbg("ALREADY VOTED! 'til next time!")
 
         # vote down any new SBs because we've already chosen a winner
-        for sb in Superblock.at_height(event_block_height):
-            if not sb.voted_on(signal=VoteSignals.funding):
-                sb.vote(dynamicd, VoteSignals.funding, VoteOutcomes.no)
+        sb_list = list(Superblock.at_height(event_block_height))
+        prefetch_network_votes(dynamicd, sb_list, VoteSignals.funding)
+        cast_votes(dynamicd, [(sb, VoteSignals.funding, VoteOutcomes.no)
+                              for sb in sb_list if not sb.voted_on(signal=VoteSignals.funding)])
 
         # now return, we're done
         return
@@ -103,12 +136,12 @@ def attempt_superblock_creation(dynamicd):
     # find the deterministic SB w/highest object_hash in the DB
     dbrec = Superblock.find_highest_deterministic(sb.hex_hash())
     if dbrec:
-        dbrec.vote(dynamicd, VoteSignals.funding, VoteOutcomes.yes)
+        cast_votes(dynamicd, [(dbrec, VoteSignals.funding, VoteOutcomes.yes)])
 
         # any other blocks which match the sb_hash are duplicates, delete them
-        for sb in Superblock.select().where(Superblock.sb_hash == sb.hex_hash()):
-            if not sb.voted_on(signal=VoteSignals.funding):
-                sb.vote(dynamicd, VoteSignals.delete, VoteOutcomes.yes)
+        duplicates = Superblock.select().where(Superblock.sb_hash == sb.hex_hash())
+        cast_votes(dynamicd, [(dup, VoteSignals.delete, VoteOutcomes.yes)
+                              for dup in duplicates if not dup.voted_on(signal=VoteSignals.funding)])
 
         printdbg("VOTED FUNDING FOR SB! We're done here 'til next superblock cycle.")
         return
@@ -124,8 +157,9 @@ def attempt_superblock_creation(dynamicd):
 def check_object_validity(dynamicd):
     # vote (in)valid objects
     for gov_class in [Proposal, Superblock]:
-        for obj in gov_class.select():
-            obj.vote_validity(dynamicd)
+        objects = list(gov_class.select())
+        prefetch_network_votes(dynamicd, objects, VoteSignals.valid)
+        cast_votes(dynamicd, [(obj, VoteSignals.valid, obj.validity_outcome()) for obj in objects])
 
 
 def is_dynamicd_port_open(dynamicd):
@@ -141,24 +175,129 @@ def is_dynamicd_port_open(dynamicd):
     return port_open
 
 
-def main():
-    dynamicd = DynamicDaemon.from_dynamic_conf(config.dynamic_conf)
-    options = process_args()
-
+def is_dynamicd_ready(dynamicd):
     # check dynamicd connectivity
     if not is_dynamicd_port_open(dynamicd):
         print("Cannot connect to dynamicd. Please ensure dynamicd is running and the JSONRPC port is open to Sentinel.")
-        return
+        return False
 
     # check dynamicd sync
     if not dynamicd.is_synced():
         print("dynamicd not synced with network! Awaiting full sync before running Sentinel.")
-        return
+        return False
 
     # ensure valid dynode
     if not dynamicd.is_dynode():
         print("Invalid Dynode Status, cannot continue.")
-        return
+        return False
+
+    return True
+
+
+def begin_run(dynamicd):
+    # take one consistent view of the chain (height, tip hash, governance
+    # info, enabled dynode count) for the whole run
+    dynamicd.refresh_chain_state()
+
+    # validity recorded by a previous run's sync may be out of date
+    GovernanceClass.validity.clear()
+
+    # answer "have we voted on this?" from memory for the rest of the run
+    vote_index.load()
+
+
+def run_sentinel(dynamicd):
+    begin_run(dynamicd)
+
+    # ========================================================================
+    # general flow:
+    # ========================================================================
+    #
+    # load "gobject list" rpc command data, sync objects into internal database
+    perform_dynamicd_object_sync(dynamicd)
+
+    # a fresh install (or reset DB) doesn't know how we voted before, pick
+    # all of our votes up from the network in one go, once
+    if not GovernanceObject.network_votes_synced():
+        GovernanceObject.sync_network_votes(dynamicd)
+
+    # retry votes an earlier run couldn't get through
+    VoteDispatcher.from_config(dynamicd).dispatch()
+
+    # delete old watchdog objects, create a new if necessary
+    watchdog_check(dynamicd)
+
+    # auto vote network objects as valid/invalid
+    # check_object_validity(dynamicd)
+
+    # create a Superblock if necessary
+    attempt_superblock_creation(dynamicd)
+
+    # schedule the next run
+    next_run_at = Scheduler.schedule_next_run()
+
+    printdbg("dynamicd RPC connection pool: %s" % dynamicd.rpc_connection.stats())
+
+    return next_run_at
+
+
+# a new block or governance object was announced: pick up any new/changed
+# objects (unchanged ones are skipped by the sync) and see whether a
+# superblock needs voting on or creating, without waiting for the next run
+def run_on_notification(dynamicd):
+    begin_run(dynamicd)
+    perform_dynamicd_object_sync(dynamicd)
+    attempt_superblock_creation(dynamicd)
+
+
+# runs run(dynamicd) if dynamicd is ready, returning whether it did
+def run_if_ready(run, dynamicd):
+    try:
+        if is_dynamicd_ready(dynamicd):
+            run(dynamicd)
+            return True
+    # dropped dynamicd connections, RPC errors and a busy DB ("database is
+    # locked") are retried later rather than ending the daemon
+    except RECONNECT_ERRORS + (JSONRPCException, peewee.OperationalError) as e:
+        print("Sentinel run failed: %s" % e)
+    finally:
+        # the next run checks a (healthy) connection out of the pool again
+        release_connection(config.db)
+
+    return False
+
+
+# stay resident, keeping the DB connection, dynamicd connections and vote
+# index warm, and run on the scheduler's timetable instead of being started
+# by cron. With a ZMQ listener, new blocks and governance objects also
+# trigger a sync straight away.
+def run_daemon(dynamicd, options, listener=None):
+    next_run_at = 0 if options.bypass else Scheduler.next_run_time()
+
+    while True:
+        # other instances (e.g. a leftover cron entry) must keep seeing us
+        hold_mutex()
+
+        now = misc.now()
+        if now >= next_run_at:
+            Scheduler.clear_schedule()
+            if run_if_ready(run_sentinel, dynamicd):
+                next_run_at = Scheduler.next_run_time()
+            else:
+                printdbg("retrying in %d seconds" % daemon_retry_seconds)
+                next_run_at = now + daemon_retry_seconds
+
+        # wake often enough to keep the mutex from expiring
+        timeout = max(1, min(next_run_at - misc.now(), daemon_wake_seconds))
+        if listener is None:
+            time.sleep(timeout)
+        elif listener.wait(timeout):
+            run_if_ready(run_on_notification, dynamicd)
+
+
+def main():
+    dynamicd = DynamicDaemon.from_dynamic_conf(config.dynamic_conf)
+    options = process_args()
 
     # register a handler if SENTINEL_DEBUG is set
     if os.environ.get('SENTINEL_DEBUG', None):
@@ -167,6 +306,14 @@ def main():
         logger.setLevel(logging.DEBUG)
         logger.addHandler(logging.StreamHandler())
 
+    if options.daemon:
+        listener = ZMQListener.from_config(config.sentinel_cfg, config.dynamic_conf)
+        run_daemon(dynamicd, options, listener)
+        return
+
+    if not is_dynamicd_ready(dynamicd):
+        return
+
     if options.bypass:
         # bypassing scheduler, remove the scheduled event
         printdbg("--bypass-schedule option used, clearing schedule")
@@ -183,32 +330,21 @@ def main():
     # running now, so remove the scheduled event
     Scheduler.clear_schedule()
 
-    # ========================================================================
-    # general flow:
-    # ========================================================================
-    #
-    # load "gobject list" rpc command data, sync objects into internal database
-    perform_dynamicd_object_sync(dynamicd)
-
-    # delete old watchdog objects, create a new if necessary
-    watchdog_check(dynamicd)
-
-    # auto vote network objects as valid/invalid
-    # check_object_validity(dynamicd)
-
-    # create a Superblock if necessary
-    attempt_superblock_creation(dynamicd)
-
-    # schedule the next run
-    Scheduler.schedule_next_run()
+    run_sentinel(dynamicd)
 
 
 def signal_handler(signum, frame):
     print("Got a signal [%d], cleaning up..." % (signum))
-    Transient.delete('SENTINEL_RUNNING')
+    Transient.delete(mutex_key)
     sys.exit(1)
 
 
+def hold_mutex():
+    # Transient.set doesn't overwrite, so drop the old timestamp first
+    Transient.delete(mutex_key)
+    Transient.set(mutex_key, misc.now(), timeout_seconds)
+
+
 def cleanup():
     Transient.delete(mutex_key)
 
@@ -219,19 +355,30 @@ def process_args():
                         action='store_true',
                         help='Bypass scheduler and sync/vote immediately',
                         dest='bypass')
+    parser.add_argument('-d', '--daemon',
+                        action='store_true',
+                        help='Keep running, syncing/voting on the scheduler\'s timetable instead of being started by cron',
+                        dest='daemon')
     args = parser.parse_args()
 
     return args
 
 
+# ensure another instance of Sentinel is not currently running
+mutex_key = 'SENTINEL_RUNNING'
+# assume that all processes expire after 'timeout_seconds' seconds
+timeout_seconds = 90
+
+# in --daemon mode, how long to wait after dynamicd wasn't ready/reachable,
+# and the longest sleep between mutex refreshes
+daemon_retry_seconds = 60
+daemon_wake_seconds = 30
+
+
 if __name__ == '__main__':
     atexit.register(cleanup)
     signal.signal(signal.SIGINT, signal_handler)
-
-    # ensure another instance of Sentinel is not currently running
-    mutex_key = 'SENTINEL_RUNNING'
-    # assume that all processes expire after 'timeout_seconds' seconds
-    timeout_seconds = 90
+    signal.signal(signal.SIGTERM, signal_handler)
 
     is_running = Transient.get(mutex_key)
     if is_running:
@@ -0,0 +1,73 @@
+"""
+asyncio front-end to DynamicDaemon (Python 3.5+ only).
+
+Every DynamicDaemon method is available as a coroutine of the same name,
+run on a thread pool sharing the daemon's keep-alive connection pool, so
+that independent RPCs overlap and a group of them takes as long as the
+slowest call rather than the sum. Concurrency is bounded by the thread pool
+size (rpc_concurrency in sentinel.conf).
+
+Results are handled on the caller's thread, so the DB is never touched
+concurrently.
+"""
+import sys
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+import misc
+from bitcoinrpc.authproxy import JSONRPCException
+
+# objects per getcurrentvotes prefetch request
+PREFETCH_CHUNK_SIZE = 25
+
+
+class AsyncDynamicDaemon(object):
+
+    def __init__(self, dynamicd, concurrency=4):
+        self.dynamicd = dynamicd
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.loop = asyncio.new_event_loop()
+
+    def __getattr__(self, name):
+        if not callable(getattr(self.dynamicd, name)):
+            return getattr(self.dynamicd, name)
+        return functools.partial(self.call, name)
+
+    async def call(self, name, *args):
+        method = getattr(self.dynamicd, name)
+        return await self.loop.run_in_executor(self.executor, functools.partial(method, *args))
+
+    def run(self, coroutine):
+        """Run coroutine to completion from synchronous code."""
+        return self.loop.run_until_complete(coroutine)
+
+    async def gather_commands(self, commands):
+        """
+        Run several rpc_commands concurrently.
+
+        Returns the results in the same order as `commands`, a failed call
+        as its JSONRPCException instance, like DynamicDaemon.rpc_batch.
+        Unlike a batch, dynamicd serves these on separate RPC threads.
+        """
+        results = await asyncio.gather(*[self.call('rpc_command', *command) for command in commands],
+                                       return_exceptions=True)
+
+        # only RPC errors are results, anything else is a real failure
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, JSONRPCException):
+                raise result
+
+        return results
+
+    async def prefetch_my_gobject_votes(self, object_hashes):
+        # several smaller batches, served in parallel by dynamicd
+        chunks = misc.chunks(list(object_hashes), PREFETCH_CHUNK_SIZE)
+        await asyncio.gather(*[self.call('prefetch_my_gobject_votes', chunk) for chunk in chunks])
+
+    def close(self):
+        self.executor.shutdown()
+        self.loop.close()
@@ -3,6 +3,7 @@ Bitcoin base58 encoding and decoding.
 
 Based on https://bitcointalk.org/index.php?topic=1026.0 (public domain)
 '''
+import binascii
 import hashlib
 
 
@@ -24,55 +25,56 @@ __b58chars = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
 __b58base = len(__b58chars)
 b58chars = __b58chars
 
+# character => digit value
+__b58values = dict((c, i) for (i, c) in enumerate(__b58chars))
+
+if hasattr(int, 'from_bytes'):
+    # Python 3.x
+    def bytes_to_long(v):
+        return int.from_bytes(v, 'big')
+
+    def long_to_bytes(n):
+        return n.to_bytes((n.bit_length() + 7) // 8, 'big')
+else:
+    def bytes_to_long(v):
+        return int(binascii.hexlify(v), 16) if v else 0
+
+    def long_to_bytes(n):
+        h = '%x' % n if n else ''
+        return binascii.unhexlify('0' * (len(h) % 2) + h)
+
 
 def b58encode(v):
     """ encode v, which is a string of bytes, to base58.
     """
-    long_value = 0
-    for (i, c) in enumerate(v[::-1]):
-        long_value += (256**i) * ord(c)
+    long_value = bytes_to_long(v)
 
-    result = ''
-    while long_value >= __b58base:
-        div, mod = divmod(long_value, __b58base)
-        result = __b58chars[mod] + result
-        long_value = div
-    result = __b58chars[long_value] + result
+    digits = []
+    while long_value:
+        long_value, mod = divmod(long_value, __b58base)
+        digits.append(__b58chars[mod])
+    result = ''.join(reversed(digits))
 
     # Bitcoin does a little leading-zero-compression:
     # leading 0-bytes in the input become leading-1s
-    nPad = 0
-    for c in v:
-        if c == '\0':
-            nPad += 1
-        else:
-            break
+    nPad = len(v) - len(v.lstrip(b'\0'))
 
     return (__b58chars[0] * nPad) + result
 
 
 def b58decode(v, length=None):
-    """ decode v into a string of len bytes
+    """ decode v into a string of len bytes, None if v isn't base58
     """
     long_value = 0
-    for (i, c) in enumerate(v[::-1]):
-        long_value += __b58chars.find(c) * (__b58base**i)
-
-    result = bytes()
-    while long_value >= 256:
-        div, mod = divmod(long_value, 256)
-        result = chr(mod) + result
-        long_value = div
-    result = chr(long_value) + result
+    try:
+        for c in v:
+            long_value = long_value * __b58base + __b58values[c]
+    except KeyError:
+        return None
 
-    nPad = 0
-    for c in v:
-        if c == __b58chars[0]:
-            nPad += 1
-        else:
-            break
+    nPad = len(v) - len(v.lstrip(__b58chars[0]))
 
-    result = chr(0) * nPad + result
+    result = chr(0) * nPad + long_to_bytes(long_value)
 
     if length is not None and len(result) != length:
         return None
@@ -97,8 +99,6 @@ def b58decode_chk(v):
     if result is None:
         return None
 
-    h3 = checksum(result[:-4])
-
     if result[-4:] == checksum(result[:-4]):
         return result[:-4]
     else:
@@ -34,6 +34,46 @@ def sqlite_test_db_name(sqlite_file_path):
     return test_sqlite_file_path
 
 
+# pragmas applied to every new SQLite connection, by sqlite_profile
+SQLITE_PROFILES = {
+    # SQLite's own defaults: rollback journal, fsync on every commit
+    'legacy': {},
+    # readers don't block the writer, every commit still fsync'd
+    'safe': {
+        'journal_mode': 'wal',
+        'synchronous': 'full',
+        'busy_timeout': 5000,
+    },
+    # WAL only needs to fsync at checkpoints with synchronous=normal, and is
+    # still safe against corruption (a power loss may roll back the last
+    # commits, which the next sync re-imports)
+    'performance': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -8000,
+        'mmap_size': 67108864,
+        'temp_store': 'memory',
+        'busy_timeout': 5000,
+    },
+}
+SQLITE_PRAGMAS = ['journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout']
+
+
+def get_sqlite_pragmas():
+    # legacy unless asked for, WAL and synchronous=normal trade away some
+    # durability which existing installs never opted into
+    profile_name = sentinel_cfg.get('sqlite_profile', 'legacy')
+    profile = dict(SQLITE_PROFILES.get(profile_name, SQLITE_PROFILES['legacy']))
+
+    # any pragma can be overridden individually, e.g. sqlite_synchronous=full
+    for pragma in SQLITE_PRAGMAS:
+        value = sentinel_cfg.get('sqlite_%s' % pragma)
+        if value:
+            profile[pragma] = value
+
+    return [(pragma, profile[pragma]) for pragma in SQLITE_PRAGMAS if pragma in profile]
+
+
 def get_db_conn():
     import peewee
     env = os.environ.get('SENTINEL_ENV', 'production')
@@ -69,8 +109,16 @@ def get_db_conn():
     if db_port:
         db_conn['port'] = int(db_port)
 
+    # keep a pool of connections to a database server, handed out per thread
+    db_pool_size = int(sentinel_cfg.get('db_pool_size', 0))
+    if db_pool_size > 0 and db_driver in ('mysql', 'postgres'):
+        from db_pool import POOLED_DRIVERS
+        driver = POOLED_DRIVERS[db_driver]
+        db_conn['max_connections'] = db_pool_size
+        db_conn['stale_timeout'] = int(sentinel_cfg.get('db_pool_stale_timeout', 300))
+
     if driver == peewee.SqliteDatabase:
-        db_conn = {}
+        db_conn = {'pragmas': get_sqlite_pragmas()}
 
     db = driver(db_name, **db_conn)
 
@@ -0,0 +1,47 @@
+"""
+Pooled MySQL/Postgres databases, selected with db_pool_size in sentinel.conf.
+
+A connection is checked out of the pool on first use and handed back by
+release_connection at the end of every --daemon run, so that each run gets
+one which has passed the pool's stale timeout and health checks, rather
+than carrying on with one the server has dropped (e.g. after a restart).
+"""
+from playhouse.pool import PooledDatabase, PooledMySQLDatabase, PooledPostgresqlDatabase
+
+
+class PooledPostgres(PooledPostgresqlDatabase):
+    """
+    Ping idle connections before handing them out again, so that one the
+    server has dropped (restart, idle timeouts...) is thrown away rather
+    than failing the first query run on it. psycopg2's conn.closed only
+    knows about closes on our side. PooledMySQLDatabase already does this
+    with conn.ping().
+    """
+
+    def _is_closed(self, key, conn):
+        closed = super(PooledPostgres, self)._is_closed(key, conn)
+        if not closed:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1')
+                cursor.close()
+                # don't leave the SELECT's implicit transaction open
+                conn.rollback()
+            except Exception:
+                closed = True
+        return closed
+
+
+POOLED_DRIVERS = {
+    'mysql': PooledMySQLDatabase,
+    'postgres': PooledPostgres,
+}
+
+
+def release_connection(db):
+    """
+    Hand a pooled connection back to the pool. A database without a pool
+    keeps its connection.
+    """
+    if isinstance(db, PooledDatabase) and not db.is_closed():
+        db.close()
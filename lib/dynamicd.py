@@ -7,10 +7,287 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'lib'))
 import config
 import base58
-from bitcoinrpc.authproxy import AuthServiceProxy, JSONRPCException
-from dynode import Dynode
+from bitcoinrpc.authproxy import JSONRPCException
+from dynode import DynodeList
 from decimal import Decimal
+import misc
+from misc import printdbg
+import base64
+import itertools
+import simplejson
+import socket
+import threading
 import time
+try:
+    import http.client as httplib
+except ImportError:
+    import httplib
+
+USER_AGENT = 'Dynamic-Sentinel'
+HTTP_TIMEOUT = 30
+
+# most getcurrentvotes calls sent in one batch request
+VOTES_BATCH_SIZE = 500
+
+# a cached block time this far below the tip is trusted without checking
+# its hash against the chain
+BLOCK_TIME_REORG_DEPTH = 100
+
+# JSONRPC error code for an unknown method
+RPC_METHOD_NOT_FOUND = -32601
+
+# memo placeholder, None being a valid answer
+NOT_FETCHED = object()
+
+# errors which mean the keep-alive socket was closed underneath us (dynamicd
+# restarted, idle connection reaped, broken pipe...)
+RECONNECT_ERRORS = (socket.error, httplib.HTTPException)
+
+
+class RPCConnection(object):
+    """ A single keep-alive (HTTP/1.1) connection to the dynamicd JSONRPC port. """
+
+    def __init__(self, host, port, user, password, timeout=HTTP_TIMEOUT):
+        self.conn = httplib.HTTPConnection(host, port, timeout=timeout)
+        authpair = ("%s:%s" % (user, password)).encode('utf-8')
+        self.auth_header = b'Basic ' + base64.b64encode(authpair)
+        self.host = host
+
+    def post(self, payload):
+        postdata = simplejson.dumps(payload, use_decimal=True)
+        self.conn.request('POST', '/', postdata, {
+            'Host': self.host,
+            'User-Agent': USER_AGENT,
+            'Authorization': self.auth_header,
+            'Content-type': 'application/json',
+        })
+        http_response = self.conn.getresponse()
+
+        # always drain the response, otherwise the socket can't be re-used
+        responsedata = http_response.read().decode('utf-8')
+
+        content_type = http_response.getheader('Content-Type')
+        if content_type != 'application/json':
+            raise JSONRPCException({
+                'code': -342,
+                'message': "non-JSON HTTP response with '%i %s' from server" % (http_response.status, http_response.reason),
+            })
+
+        return simplejson.loads(responsedata, use_decimal=True)
+
+    def close(self):
+        self.conn.close()
+
+
+class RPCConnectionPool(object):
+    """
+    Pool of keep-alive connections to dynamicd.
+
+    Connections are handed out LIFO so that the warmest socket is re-used. A
+    re-used connection which turns out to be dead is transparently replaced
+    by a fresh one and the request retried once.
+    """
+
+    def __init__(self, host, port, user, password, size=4, timeout=HTTP_TIMEOUT):
+        self.creds = (host, port, user, password)
+        self.size = size
+        self.timeout = timeout
+
+        self.idle = []
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+
+    def connect(self):
+        return RPCConnection(*self.creds, timeout=self.timeout)
+
+    def acquire(self):
+        with self.lock:
+            if self.idle:
+                self.hits += 1
+                return (self.idle.pop(), True)
+            self.misses += 1
+        return (self.connect(), False)
+
+    def release(self, conn):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, payload):
+        (conn, reused) = self.acquire()
+        try:
+            try:
+                response = conn.post(payload)
+            except socket.timeout:
+                raise
+            except RECONNECT_ERRORS as e:
+                conn.close()
+                # a fresh connection failing is a real error, not a stale socket
+                if not reused:
+                    raise
+                printdbg("[info]: stale dynamicd connection (%s), reconnecting" % e)
+                with self.lock:
+                    self.reconnects += 1
+                conn = self.connect()
+                response = conn.post(payload)
+        except Exception:
+            conn.close()
+            raise
+
+        self.release(conn)
+        return response
+
+    def call(self, method, *params):
+        response = self.request({
+            'version': '1.1',
+            'method': method,
+            'params': list(params),
+            'id': next(self.ids),
+        })
+        if response.get('error') is not None:
+            raise JSONRPCException(response['error'])
+        elif 'result' not in response:
+            raise JSONRPCException({
+                'code': -343, 'message': 'missing JSON-RPC result'})
+
+        return response['result']
+
+    def batch(self, calls):
+        """
+        Send several calls in a single JSON-RPC batch request.
+
+        Returns the results in the same order as `calls`. A call which failed
+        is returned as a JSONRPCException instance instead of being raised, so
+        one bad item doesn't throw away the rest of the batch.
+        """
+        if not calls:
+            return []
+
+        call_ids = [next(self.ids) for call in calls]
+        payload = [{'jsonrpc': '2.0', 'method': call[0], 'params': list(call[1:]), 'id': call_id}
+                   for (call_id, call) in zip(call_ids, calls)]
+
+        responses = self.request(payload)
+        if not isinstance(responses, list):
+            # the whole batch was rejected
+            raise JSONRPCException(responses.get('error') or {
+                'code': -343, 'message': 'missing JSON-RPC batch result'})
+
+        by_id = {response.get('id'): response for response in responses}
+        results = []
+        for call_id in call_ids:
+            response = by_id.get(call_id, {})
+            if response.get('error') is not None:
+                results.append(JSONRPCException(response['error']))
+            elif 'result' not in response:
+                results.append(JSONRPCException({
+                    'code': -343, 'message': 'missing JSON-RPC result'}))
+            else:
+                results.append(response['result'])
+
+        return results
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'reconnects': self.reconnects,
+                'idle': len(self.idle),
+            }
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+class ChainState(object):
+    """
+    Snapshot of the chain state as seen by dynamicd at one point in time.
+
+    Taken once per sentinel run so that all the helpers below work from the
+    same tip instead of each asking dynamicd for the block count again.
+    """
+
+    def __init__(self, height, block_hash, governance_info, enabled_dynodes):
+        self.height = height
+        self.block_hash = block_hash
+        self.governance_info = governance_info
+        self.enabled_dynodes = enabled_dynodes
+        self.taken_at = time.time()
+
+
+# seconds each cached dynamicd answer is kept at most, see RPCCache. Those in
+# HEIGHT_BOUND_RPCS are also dropped as soon as a new block arrives.
+RPC_CACHE_TTLS = {
+    'getgovernanceinfo': 3600,
+    'dynode count': 600,
+    'getsuperblockbudget': 86400,
+    'dnsync status': 60,
+}
+HEIGHT_BOUND_RPCS = set(['getgovernanceinfo', 'dynode count', 'dnsync status'])
+
+
+class RPCCache(object):
+    """
+    TTL cache for dynamicd answers which only change from block to block.
+
+    Entries remember the height they were fetched at. With a store (the
+    Transient settings) they're also persisted, so that repeated runs within
+    a block don't ask dynamicd again.
+    """
+
+    def __init__(self, ttls=RPC_CACHE_TTLS, store=None):
+        self.ttls = ttls
+        self.store = store
+        self.entries = {}
+
+    @staticmethod
+    def store_key(key):
+        return 'RPC_CACHE_%s' % key.replace(' ', '_')
+
+    # key is the method name plus any params, e.g. 'getsuperblockbudget 240'
+    def get(self, name, key, height=None):
+        """
+        Cached answer for key, or NOT_FETCHED. height is the current block
+        height, if known.
+        """
+        entry = self.entries.get(key)
+        if entry is None and self.store is not None:
+            # the whole entry as one JSON string, Transient values must be
+            # scalars
+            stored = self.store.get(self.store_key(key))
+            if stored:
+                entry = simplejson.loads(stored, use_decimal=True)
+                self.entries[key] = entry
+
+        if entry is None or entry['expires_at'] <= time.time():
+            return NOT_FETCHED
+        if name in HEIGHT_BOUND_RPCS and height is not None and entry['height'] != height:
+            return NOT_FETCHED
+
+        return entry['value']
+
+    def set(self, name, key, value, height=None):
+        ttl = self.ttls.get(name, 0)
+        if ttl <= 0:
+            return
+
+        entry = {'value': value, 'height': height, 'expires_at': int(time.time()) + ttl}
+        self.entries[key] = entry
+
+        if self.store is not None:
+            stored = simplejson.dumps(entry, use_decimal=True)
+            self.store.delete(self.store_key(key))
+            self.store.set(self.store_key(key), stored, ttl)
 
 
 class DynamicDaemon():
@@ -19,35 +296,171 @@ class DynamicDaemon():
         user = kwargs.get('user')
         password = kwargs.get('password')
         port = kwargs.get('port')
+        pool_size = int(kwargs.get('pool_size', 4))
+        # independent RPCs in flight at once, see concurrent()
+        self.concurrency = int(kwargs.get('concurrency', 1))
+        self.async_daemon = None
 
         self.creds = (user, password, host, port)
+        self.pool = RPCConnectionPool(host, port, user, password, size=pool_size)
 
         # memoize calls to some dynamicd methods
         self.governance_info = None
         self.gobject_votes = {}
 
+        # set by refresh_chain_state, otherwise helpers query dynamicd directly
+        self.chain_state = None
+
+        # our vin from `dynode status`, fetched once per chain snapshot
+        self.dynode_vin = NOT_FETCHED
+        # likewise the DynodeList from `dynodelist full`
+        self.dynode_list = NOT_FETCHED
+
+        # local view of the dynode list (models.dynode_registry), optional
+        self.dynode_registry = kwargs.get('dynode_registry')
+        self.dynode_registry_synced = False
+
+        self.rpc_cache = RPCCache(kwargs.get('rpc_cache_ttls', RPC_CACHE_TTLS), kwargs.get('rpc_cache_store'))
+
+        # height => timestamp of mined blocks (the BlockTime model), optional
+        self.block_time_store = kwargs.get('block_time_store')
+        # older daemons only have getblock
+        self.has_getblockheader = True
+
     @property
     def rpc_connection(self):
-        return AuthServiceProxy("http://{0}:{1}@{2}:{3}".format(*self.creds))
+        return self.pool
 
     @classmethod
     def from_dynamic_conf(self, dynamic_dot_conf):
         from dynamic_config import DynamicConfig
         config_text = DynamicConfig.slurp_config_file(dynamic_dot_conf)
         creds = DynamicConfig.get_rpc_creds(config_text, config.network)
+        creds['pool_size'] = config.sentinel_cfg.get('rpc_pool_size', 4)
+        creds['concurrency'] = config.sentinel_cfg.get('rpc_concurrency', 1)
+
+        # e.g. rpc_cache_ttl_dynode_count=300, 0 to disable
+        ttls = dict(RPC_CACHE_TTLS)
+        for name in ttls:
+            ttl = config.sentinel_cfg.get('rpc_cache_ttl_%s' % name.replace(' ', '_'))
+            if ttl:
+                ttls[name] = int(ttl)
+        creds['rpc_cache_ttls'] = ttls
+
+        from models import Transient, BlockTime, dynode_registry
+        creds['rpc_cache_store'] = Transient
+        creds['block_time_store'] = BlockTime
+        creds['dynode_registry'] = dynode_registry
 
         return self(**creds)
 
     def rpc_command(self, *params):
-        return self.rpc_connection.__getattr__(params[0])(*params[1:])
+        return self.rpc_connection.call(*params)
+
+    # rpc_command, answered from rpc_cache when possible. name selects the
+    # TTL, e.g. cached_rpc_command('dynode count', 'dynode', 'count', 'enabled')
+    def cached_rpc_command(self, name, *params):
+        key = ' '.join(str(param) for param in params)
+        height = self.chain_state.height if self.chain_state else None
+
+        value = self.rpc_cache.get(name, key, height)
+        if value is NOT_FETCHED:
+            value = self.rpc_command(*params)
+            self.rpc_cache.set(name, key, value, height)
+        return value
+
+    # calls is a list of param lists, e.g. [['getblockhash', 1], ['getblockcount']]
+    #
+    # results are returned in order, failed calls as JSONRPCException instances
+    def rpc_batch(self, calls):
+        return self.rpc_connection.batch(calls)
+
+    def concurrent(self):
+        """
+        AsyncDynamicDaemon sharing this daemon's connections, or None when
+        rpc_concurrency is 1 or asyncio isn't available (Python < 3.5).
+        """
+        if self.concurrency <= 1 or sys.version_info < (3, 5):
+            return None
+
+        if self.async_daemon is None:
+            from async_dynamicd import AsyncDynamicDaemon
+            self.async_daemon = AsyncDynamicDaemon(self, self.concurrency)
+        return self.async_daemon
+
+    def close(self):
+        if self.async_daemon:
+            self.async_daemon.close()
+        self.pool.close()
+
+    def refresh_chain_state(self):
+        height = self.rpc_command('getblockcount')
+
+        # governance info and dynode count are fetched at most once a block
+        answers = {}
+        pending = []
+        for (name, params) in [('getgovernanceinfo', ['getgovernanceinfo']),
+                               ('dynode count', ['dynode', 'count', 'enabled'])]:
+            key = ' '.join(params)
+            answers[key] = self.rpc_cache.get(name, key, height)
+            if answers[key] is NOT_FETCHED:
+                pending.append((name, key, params))
+
+        # the hash must be taken at the same height as the count, so it can't
+        # be batched with getblockcount
+        results = self.rpc_batch([['getblockhash', height]] + [params for (name, key, params) in pending])
+        for result in results:
+            if isinstance(result, JSONRPCException):
+                raise result
+
+        block_hash = results[0]
+        for ((name, key, params), result) in zip(pending, results[1:]):
+            answers[key] = result
+            self.rpc_cache.set(name, key, result, height)
+
+        governance_info = answers['getgovernanceinfo']
+        enabled_dynodes = answers['dynode count enabled']
+
+        self.chain_state = ChainState(height, block_hash, governance_info, enabled_dynodes)
+        self.governance_info = governance_info
+
+        # memoized votes and status belong to the previous view of the chain
+        self.gobject_votes = {}
+        self.dynode_vin = NOT_FETCHED
+        self.dynode_list = NOT_FETCHED
+        self.dynode_registry_synced = False
+        printdbg("chain state: height = %d, block hash = %s" % (height, block_hash))
+
+        return self.chain_state
+
+    def block_height(self):
+        if self.chain_state:
+            return self.chain_state.height
+        return self.rpc_command('getblockcount')
 
     # common RPC convenience methods
     def is_testnet(self):
         return self.rpc_command('getinfo')['testnet']
 
     def get_dynodes(self):
+        # parsed once per chain snapshot
+        if self.dynode_list is not NOT_FETCHED:
+            return self.dynode_list
+
         dnlist = self.rpc_command('dynodelist', 'full')
-        return [Dynode(k, v) for (k, v) in dnlist.items()]
+        dynodes = DynodeList.from_dynodelist(dnlist)
+        if self.chain_state:
+            self.dynode_list = dynodes
+        return dynodes
+
+    def sync_dynode_registry(self):
+        # once per chain snapshot
+        if self.dynode_registry_synced:
+            return
+
+        dnlist = self.rpc_command('dynodelist', 'full')
+        self.dynode_registry.sync(dnlist)
+        self.dynode_registry_synced = bool(self.chain_state)
 
     def get_object_list(self):
         try:
@@ -59,19 +472,27 @@ class DynamicDaemon():
     def get_current_dynode_vin(self):
         from dynamiclib import parse_dynode_status_vin
 
+        if self.dynode_vin is not NOT_FETCHED:
+            return self.dynode_vin
+
         my_vin = None
 
         try:
             status = self.rpc_command('dynode', 'status')
             my_vin = parse_dynode_status_vin(status['vin'])
         except JSONRPCException as e:
-            pass
+            # not memoized, the next call asks again
+            return my_vin
 
+        if self.chain_state:
+            self.dynode_vin = my_vin
         return my_vin
 
     def governance_quorum(self):
-        # TODO: expensive call, so memoize this
-        total_dynodes = self.rpc_command('dynode', 'count', 'enabled')
+        if self.chain_state:
+            total_dynodes = self.chain_state.enabled_dynodes
+        else:
+            total_dynodes = self.cached_rpc_command('dynode count', 'dynode', 'count', 'enabled')
         min_quorum = self.govinfo['governanceminquorum']
 
         # the minimum quorum is calculated based on the number of dynodes
@@ -81,7 +502,7 @@ class DynamicDaemon():
     @property
     def govinfo(self):
         if (not self.governance_info):
-            self.governance_info = self.rpc_command('getgovernanceinfo')
+            self.governance_info = self.cached_rpc_command('getgovernanceinfo', 'getgovernanceinfo')
         return self.governance_info
 
     # governance info convenience methods
@@ -95,7 +516,7 @@ class DynamicDaemon():
         return self.govinfo['proposalfee']
 
     def last_superblock_height(self):
-        height = self.rpc_command('getblockcount')
+        height = self.block_height()
         cycle = self.superblockcycle()
         return cycle * (height // cycle)
 
@@ -106,7 +527,7 @@ class DynamicDaemon():
         return not (self.get_current_dynode_vin() is None)
 
     def is_synced(self):
-        dnsync_status = self.rpc_command('dnsync', 'status')
+        dnsync_status = self.cached_rpc_command('dnsync status', 'dnsync', 'status')
         synced = (dnsync_status['IsBlockchainSynced'] and
                   dnsync_status['IsDynodeListSynced'] and
                   dnsync_status['IsWinnersListSynced'] and
@@ -115,24 +536,42 @@ class DynamicDaemon():
         return synced
 
     def current_block_hash(self):
+        if self.chain_state:
+            return self.chain_state.block_hash
+
         height = self.rpc_command('getblockcount')
         block_hash = self.rpc_command('getblockhash', height)
         return block_hash
 
     def get_superblock_budget_allocation(self, height=None):
         if height is None:
-            height = self.rpc_command('getblockcount')
-        return Decimal(self.rpc_command('getsuperblockbudget', height))
+            height = self.block_height()
+        return Decimal(self.cached_rpc_command('getsuperblockbudget', 'getsuperblockbudget', height))
+
+    # fetch the budget allocations for several heights in one round trip
+    def get_superblock_budget_allocations(self, heights):
+        keys = ['getsuperblockbudget %s' % height for height in heights]
+        budgets = [self.rpc_cache.get('getsuperblockbudget', key) for key in keys]
+
+        missing = [i for (i, budget) in enumerate(budgets) if budget is NOT_FETCHED]
+        results = self.rpc_batch([['getsuperblockbudget', heights[i]] for i in missing])
+        for (i, result) in zip(missing, results):
+            if isinstance(result, JSONRPCException):
+                raise result
+            budgets[i] = result
+            self.rpc_cache.set('getsuperblockbudget', keys[i], result)
+
+        return [Decimal(budget) for budget in budgets]
 
     def next_superblock_max_budget(self):
         cycle = self.superblockcycle()
-        current_block_height = self.rpc_command('getblockcount')
+        current_block_height = self.block_height()
 
         last_superblock_height = (current_block_height // cycle) * cycle
         next_superblock_height = last_superblock_height + cycle
 
-        last_allocation = self.get_superblock_budget_allocation(last_superblock_height)
-        next_allocation = self.get_superblock_budget_allocation(next_superblock_height)
+        (last_allocation, next_allocation) = self.get_superblock_budget_allocations(
+            [last_superblock_height, next_superblock_height])
 
         next_superblock_max_budget = next_allocation
 
@@ -141,21 +580,49 @@ class DynamicDaemon():
     # "my" votes refers to the current running dynode
     # memoized on a per-run, per-object_hash basis
     def get_my_gobject_votes(self, object_hash):
-        import dynamiclib
-        if not self.gobject_votes.get(object_hash):
-            my_vin = self.get_current_dynode_vin()
-            # if we can't get DN vin from output of `dynode status`,
-            # return an empty list
-            if not my_vin:
-                return []
+        if object_hash not in self.gobject_votes:
+            self.prefetch_my_gobject_votes([object_hash])
 
-            (txid, vout_index) = my_vin.split('-')
+        return self.gobject_votes.get(object_hash, [])
 
-            cmd = ['gobject', 'getcurrentvotes', object_hash, txid, vout_index]
-            raw_votes = self.rpc_command(*cmd)
-            self.gobject_votes[object_hash] = dynamiclib.parse_raw_votes(raw_votes)
+    # fetch "my" votes for several objects with a single batch request, so
+    # that a subsequent get_my_gobject_votes is served from the memo
+    def prefetch_my_gobject_votes(self, object_hashes):
+        """
+        Fetch our votes on all of object_hashes in batched requests, for
+        get_my_gobject_votes. Returns the hashes the daemon couldn't give
+        votes for this time.
+        """
+        import dynamiclib
 
-        return self.gobject_votes[object_hash]
+        wanted = [h for h in object_hashes if h not in self.gobject_votes]
+        if not wanted:
+            return []
+
+        my_vin = self.get_current_dynode_vin()
+        # if we can't get DN vin from output of `dynode status`,
+        # there is nothing to fetch
+        if not my_vin:
+            return []
+
+        (txid, vout_index) = my_vin.split('-')
+
+        raw_votes_by_hash = {}
+        failed = []
+        for chunk in misc.chunks(wanted, VOTES_BATCH_SIZE):
+            calls = [['gobject', 'getcurrentvotes', h, txid, vout_index] for h in chunk]
+            for (object_hash, raw_votes) in zip(chunk, self.rpc_batch(calls)):
+                if isinstance(raw_votes, JSONRPCException):
+                    printdbg("Unable to get votes for gobject %s: %s" % (object_hash, raw_votes))
+                    failed.append(object_hash)
+                    continue
+                raw_votes_by_hash[object_hash] = raw_votes
+
+        self.gobject_votes.update(dynamiclib.parse_raw_votes_bulk(raw_votes_by_hash))
+        # memoized as no votes, rather than asked for again one at a time by
+        # get_my_gobject_votes
+        self.gobject_votes.update((object_hash, []) for object_hash in failed)
+        return failed
 
     def is_govobj_maturity_phase(self):
         # 3-day period for govobj maturity
@@ -163,12 +630,11 @@ class DynamicDaemon():
         if config.network == 'testnet':
             maturity_phase_delta = 24    # testnet
 
-        event_block_height = self.next_superblock_height()
+        current_height = self.block_height()
+        cycle = self.superblockcycle()
+        event_block_height = cycle * (current_height // cycle) + cycle
         maturity_phase_start_block = event_block_height - maturity_phase_delta
 
-        current_height = self.rpc_command('getblockcount')
-        event_block_height = self.next_superblock_height()
-
         # print "current_height = %d" % current_height
         # print "event_block_height = %d" % event_block_height
         # print "maturity_phase_delta = %d" % maturity_phase_delta
@@ -180,8 +646,12 @@ class DynamicDaemon():
         import dynamiclib
         # find the elected DN vin for superblock creation...
         current_block_hash = self.current_block_hash()
-        dn_list = self.get_dynodes()
-        winner = dynamiclib.elect_dn(block_hash=current_block_hash, dnlist=dn_list)
+        if self.dynode_registry is not None:
+            self.sync_dynode_registry()
+            winner = dynamiclib.dn_election.winner(current_block_hash, self.dynode_registry.enabled_vins())
+        else:
+            dn_list = self.get_dynodes()
+            winner = dynamiclib.elect_dn(block_hash=current_block_hash, dnlist=dn_list)
         my_vin = self.get_current_dynode_vin()
 
         # print "current_block_hash: [%s]" % current_block_hash
@@ -199,14 +669,15 @@ class DynamicDaemon():
     def SENTINEL_WATCHDOG_MAX_SECONDS(self):
         return (self.DYNODE_WATCHDOG_MAX_SECONDS // 2)
 
-    def estimate_block_time(self, height):
+    def estimate_block_time(self, height, current_block_height=None):
         """
         Called by block_height_to_epoch if block height is in the future.
         Call `block_height_to_epoch` instead of this method.
 
         DO NOT CALL DIRECTLY if you don't want a "Oh Noes." exception.
         """
-        current_block_height = self.rpc_command('getblockcount')
+        if current_block_height is None:
+            current_block_height = self.block_height()
         diff = height - current_block_height
 
         if (diff < 0):
@@ -222,18 +693,63 @@ class DynamicDaemon():
         """
         Get the epoch for a given block height, or estimate it if the block hasn't
         been mined yet. Call this method instead of `estimate_block_time`.
+
+        Timestamps of mined blocks are kept in block_time_store, so after the
+        first time this is a local lookup.
         """
         epoch = -1
 
+        # no need to ask dynamicd about a block we know isn't mined yet
+        if self.chain_state and height > self.chain_state.height:
+            return self.estimate_block_time(height)
+
+        # deep enough not to be reorged away
+        if self.chain_state and height <= self.chain_state.height - BLOCK_TIME_REORG_DEPTH:
+            epoch = self.cached_block_time(height)
+            if epoch is not None:
+                return epoch
+
+        # fetch the tip height along with the hash, so that a future height
+        # can be estimated without another round trip
+        (bhash, current_block_height) = self.rpc_batch([
+            ['getblockhash', height],
+            ['getblockcount'],
+        ])
+
         try:
-            bhash = self.rpc_command('getblockhash', height)
-            block = self.rpc_command('getblock', bhash)
-            epoch = block['time']
+            if isinstance(current_block_height, JSONRPCException):
+                raise current_block_height
+            if isinstance(bhash, JSONRPCException):
+                raise bhash
+
+            # near the tip, only if it's still the same block
+            epoch = self.cached_block_time(height, bhash)
+            if epoch is None:
+                epoch = self.get_block_time(bhash)
+                if self.block_time_store is not None:
+                    self.block_time_store.record(height, bhash, epoch)
         except JSONRPCException as e:
             if e.message == 'Block height out of range':
-                epoch = self.estimate_block_time(height)
+                epoch = self.estimate_block_time(height, current_block_height)
             else:
                 print("error: %s" % e)
                 raise e
 
         return epoch
+
+    def cached_block_time(self, height, block_hash=None):
+        if self.block_time_store is None:
+            return None
+        return self.block_time_store.lookup(height, block_hash)
+
+    def get_block_time(self, block_hash):
+        # getblockheader skips serialising every transaction in the block
+        if self.has_getblockheader:
+            try:
+                return self.rpc_command('getblockheader', block_hash)['time']
+            except JSONRPCException as e:
+                if e.code != RPC_METHOD_NOT_FOUND:
+                    raise e
+                self.has_getblockheader = False
+
+        return self.rpc_command('getblock', block_hash)['time']
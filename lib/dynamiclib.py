@@ -8,11 +8,42 @@ import re
 from decimal import Decimal
 import simplejson
 import binascii
-from misc import printdbg, epoch2str
+import heapq
+from misc import printdbg, epoch2str, LRUCache
 import time
 
 
+# (address, network) => is_valid_dynamic_address verdict, the same addresses
+# turning up in every proposal and superblock on every run
+address_validity = LRUCache(10000)
+
+
 def is_valid_dynamic_address(address, network='mainnet'):
+    key = (address, network)
+    valid = address_validity.get(key)
+    if valid is None:
+        valid = check_dynamic_address(address, network)
+        address_validity.set(key, valid)
+    return valid
+
+
+def validate_dynamic_addresses(addresses, network='mainnet'):
+    """
+    Validate a list of addresses, e.g. a superblock's payment addresses.
+
+    Each distinct address is checked once, and the verdicts memoised like
+    is_valid_dynamic_address's.
+
+    Returns the verdicts, one per address.
+    """
+    verdicts = {}
+    for address in set(addresses):
+        verdicts[address] = is_valid_dynamic_address(address, network)
+
+    return [verdicts[address] for address in addresses]
+
+
+def check_dynamic_address(address, network='mainnet'):
     # Only public key addresses are allowed
     # A valid address is a RIPEMD-160 hash which contains 20 bytes
     # Prior to base58 encoding 1 version byte is prepended and
@@ -41,8 +72,83 @@ def is_valid_dynamic_address(address, network='mainnet'):
     return True
 
 
+# big-endian bytes => int
+if hasattr(int, 'from_bytes'):
+    def bytes_to_int(data):
+        return int.from_bytes(data, 'big')
+else:
+    def bytes_to_int(data):
+        return int(binascii.hexlify(data), 16)
+
+
 def hashit(data):
-    return int(hashlib.sha256(data.encode('utf-8')).hexdigest(), 16)
+    return bytes_to_int(hashlib.sha256(data.encode('utf-8')).digest())
+
+
+# identifies the content of a "gobject list" entry, vote counts excluded, so
+# that unchanged objects can be skipped on sync
+def gobject_fingerprint(rec):
+    data = '|'.join([rec['Hash'], rec['CollateralHash'], rec['DataHex']])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class DynodeElection(object):
+    """
+    Dynode election: the enabled dynode whose hashed vin is closest to the
+    hashed block hash wins.
+
+    Vin hashes are cached, collateral outpoints rarely changing from one run
+    to the next (the cache is trimmed to the current list once it's grown
+    well beyond it).
+    """
+
+    def __init__(self):
+        self.vin_hashes = {}
+
+    def vin_hash(self, vin):
+        vin_hash = self.vin_hashes.get(vin)
+        if vin_hash is None:
+            vin_hash = self.vin_hashes[vin] = hashit(vin)
+        return vin_hash
+
+    def winner(self, block_hash, vins):
+        """ Winning vin, or None if there are no candidates. """
+        block_hash_hash = hashit(block_hash)
+        vin_hashes = self.vin_hashes
+
+        # single pass, the first of equally close vins wins
+        (winner, best) = (None, None)
+        for vin in vins:
+            vin_hash = vin_hashes.get(vin)
+            if vin_hash is None:
+                vin_hash = vin_hashes[vin] = hashit(vin)
+            diff = abs(vin_hash - block_hash_hash)
+            if best is None or diff < best:
+                (winner, best) = (vin, diff)
+
+        self.trim(vins)
+        return winner
+
+    def rank(self, block_hash, vins, top=10):
+        """ The `top` closest vins, as (vin, diff) pairs, winner first. """
+        block_hash_hash = hashit(block_hash)
+        candidates = ((abs(self.vin_hash(vin) - block_hash_hash), i, vin) for (i, vin) in enumerate(vins))
+        return [(vin, diff) for (diff, i, vin) in heapq.nsmallest(top, candidates)]
+
+    def trim(self, vins):
+        if len(self.vin_hashes) > 2 * len(vins) + 1000:
+            self.vin_hashes = dict((vin, self.vin_hashes[vin]) for vin in vins)
+
+
+# kept for the life of the process, i.e. across --daemon runs
+dn_election = DynodeElection()
+
+
+def enabled_vins(dn_list):
+    # DynodeList has the status column to hand
+    if hasattr(dn_list, 'vins_with_status'):
+        return dn_list.vins_with_status('ENABLED')
+    return [dn.vin for dn in dn_list if dn.status == 'ENABLED']
 
 
 # returns the dynode VIN of the elected winner
@@ -50,26 +156,15 @@ def elect_dn(**kwargs):
     current_block_hash = kwargs['block_hash']
     dn_list = kwargs['dnlist']
 
-    # filter only enabled DNs
-    enabled = [dn for dn in dn_list if dn.status == 'ENABLED']
-
-    block_hash_hash = hashit(current_block_hash)
+    return dn_election.winner(current_block_hash, enabled_vins(dn_list))
 
-    candidates = []
-    for dn in enabled:
-        dn_vin_hash = hashit(dn.vin)
-        diff = dn_vin_hash - block_hash_hash
-        absdiff = abs(diff)
-        candidates.append({'vin': dn.vin, 'diff': absdiff})
 
-    candidates.sort(key=lambda k: k['diff'])
-
-    try:
-        winner = candidates[0]['vin']
-    except:
-        winner = None
+# returns the `top` closest (vin, diff) pairs, for diagnostics
+def rank_dns(**kwargs):
+    current_block_hash = kwargs['block_hash']
+    dn_list = kwargs['dnlist']
 
-    return winner
+    return dn_election.rank(current_block_hash, enabled_vins(dn_list), kwargs.get('top', 10))
 
 
 def parse_dynode_status_vin(status_vin_string):
@@ -172,55 +267,51 @@ def create_superblock(proposals, event_block_height, budget_max, sb_epoch_time):
     return sb
 
 
-# shims 'til we can fix the dynamicd side
-def SHIM_serialise_for_dynamicd(sentinel_hex):
-    from models import DYNAMICD_GOVOBJ_TYPES
-    # unpack
-    obj = deserialise(sentinel_hex)
+# dynamicd wraps each govobj in an array, calls superblocks "trigger" and adds
+# a redundant numeric 'type' attribute. These convert between that format and
+# sentinel's (govtype, dict) in a single pass.
+def decode_dynamicd_gobject(dynamicd_hex):
+    # only one element in the array...
+    obj = deserialise(dynamicd_hex)[0]
 
-    # shim for dynamicd
     govtype = obj[0]
-
-    # add 'type' attribute
-    obj[1]['type'] = DYNAMICD_GOVOBJ_TYPES[govtype]
+    dikt = obj[1]
 
     # superblock => "trigger" in dynamicd
-    if govtype == 'superblock':
-        obj[0] = 'trigger'
+    if govtype == 'trigger':
+        govtype = 'superblock'
 
-    # dynamicd expects an array (even though there is only a 1:1 relationship between govobj->class)
-    obj = [obj]
+    # remove redundant 'type' attribute
+    dikt.pop('type', None)
 
-    # re-pack
-    dynamicd_hex = serialise(obj)
-    return dynamicd_hex
+    return (govtype, dikt)
 
 
-# shims 'til we can fix the dynamicd side
-def SHIM_deserialise_from_dynamicd(dynamicd_hex):
+def encode_dynamicd_gobject(govtype, dikt):
     from models import DYNAMICD_GOVOBJ_TYPES
 
-    # unpack
-    obj = deserialise(dynamicd_hex)
+    # add 'type' attribute
+    dikt = dict(dikt)
+    dikt['type'] = DYNAMICD_GOVOBJ_TYPES[govtype]
 
-    # shim from dynamicd
-    # only one element in the array...
-    obj = obj[0]
+    # superblock => "trigger" in dynamicd
+    if govtype == 'superblock':
+        govtype = 'trigger'
 
-    # extract the govobj type
-    govtype = obj[0]
+    # dynamicd expects an array (even though there is only a 1:1 relationship between govobj->class)
+    return serialise([[govtype, dikt]])
 
-    # superblock => "trigger" in dynamicd
-    if govtype == 'trigger':
-        obj[0] = govtype = 'superblock'
 
-    # remove redundant 'type' attribute
-    if 'type' in obj[1]:
-        del obj[1]['type']
+# shims 'til we can fix the dynamicd side
+def SHIM_serialise_for_dynamicd(sentinel_hex):
+    (govtype, dikt) = deserialise(sentinel_hex)
+    return encode_dynamicd_gobject(govtype, dikt)
 
-    # re-pack
-    sentinel_hex = serialise(obj)
-    return sentinel_hex
+
+# shims 'til we can fix the dynamicd side
+def SHIM_deserialise_from_dynamicd(dynamicd_hex):
+    (govtype, dikt) = decode_dynamicd_gobject(dynamicd_hex)
+    return serialise([govtype, dikt])
 
 
 # convenience
@@ -236,53 +327,77 @@ def serialise(dikt):
     return hexdata
 
 
-def did_we_vote(output):
+# outcomes of a `gobject vote-conf`
+VOTE_SUCCESS = 'success'
+VOTE_RATE_LIMITED = 'rate_limited'
+VOTE_FAILED = 'failed'
+
+
+# output is vote-conf's result, or the JSONRPCException it raised
+def parse_vote_result(output):
     from bitcoinrpc.authproxy import JSONRPCException
 
-    # sentinel
-    voted = False
     err_msg = ''
 
-    try:
+    if isinstance(output, JSONRPCException):
+        result = 'failed'
+        err_msg = output.message or ''
+    else:
         detail = output.get('detail').get('dynamic.conf')
         result = detail.get('result')
         if 'errorMessage' in detail:
             err_msg = detail.get('errorMessage')
-    except JSONRPCException as e:
-        result = 'failed'
-        err_msg = e.message
 
     # success, failed
     printdbg("result  = [%s]" % result)
     if err_msg:
         printdbg("err_msg = [%s]" % err_msg)
 
-    voted = False
     if result == 'success':
-        voted = True
+        return (VOTE_SUCCESS, err_msg)
 
-    # in case we spin up a new instance or server, but have already voted
-    # on the network and network has recorded those votes
+    # dynamicd refuses to take another vote from us on this object/signal so
+    # soon, typically because we (or another instance of us) already voted
     m_old = re.match(r'^time between votes is too soon', err_msg)
     m_new = re.search(r'Dynode voting too often', err_msg, re.M)
 
-    if result == 'failed' and (m_old or m_new):
+    if m_old or m_new:
         printdbg("DEBUG: Voting too often, need to sync w/network")
-        voted = False
+        return (VOTE_RATE_LIMITED, err_msg)
+
+    return (VOTE_FAILED, err_msg)
 
-    return voted
+
+def did_we_vote(output):
+    (status, err_msg) = parse_vote_result(output)
+    return status == VOTE_SUCCESS
 
 
 def parse_raw_votes(raw_votes):
+    return parse_votes(raw_votes, {})
+
+
+# parse_raw_votes for many objects at once, {object_hash: raw votes} =>
+# {object_hash: votes}. Our own votes all carry the same collateral
+# outpoint, so each distinct outpoint is only run through the regex once.
+def parse_raw_votes_bulk(raw_votes_by_hash):
+    vins = {}
+    return {object_hash: parse_votes(raw_votes, vins) for (object_hash, raw_votes) in raw_votes_by_hash.items()}
+
+
+# vins memoizes parse_dynode_status_vin by outpoint
+def parse_votes(raw_votes, vins):
     votes = []
     for v in list(raw_votes.values()):
         (outpoint, ntime, outcome, signal) = v.split(':')
         signal = signal.lower()
         outcome = outcome.lower()
 
-        dn_collateral_outpoint = parse_dynode_status_vin(outpoint)
+        if outpoint not in vins:
+            vins[outpoint] = parse_dynode_status_vin(outpoint)
+
         v = {
-            'dn_collateral_outpoint': dn_collateral_outpoint,
+            'dn_collateral_outpoint': vins[outpoint],
             'signal': signal,
             'outcome': outcome,
             'ntime': ntime,
@@ -1,24 +1,88 @@
 # basically just parse & make it easier to access the DN data from the output of
 # "dynodelist full"
+from array import array
 
+try:
+    from sys import intern
+except ImportError:
+    pass
 
-class Dynode():
-    def __init__(self, collateral, dnstring):
-        (txid, vout_index) = self.parse_collateral_string(collateral)
-        self.txid = txid
-        self.vout_index = int(vout_index)
 
-        (status, protocol, address, ip_port, lastseen, activeseconds, lastpaid) = self.parse_dn_string(dnstring)
-        self.status = status
-        self.protocol = int(protocol)
-        self.address = address
+class DynodeList(object):
+    """
+    Columnar `dynodelist full`: one list/array per field instead of an object
+    per dynode, so thousands of entries are cheap to parse and hold. Indexing
+    or iterating gives Dynode views onto a row.
+    """
+
+    def __init__(self):
+        # collateral outpoints, 'txid-index'
+        self.vins = []
+        # interned, there are only a handful of distinct values
+        self.statuses = []
+        self.protocols = array('l')
+        self.addresses = []
+        self.ip_ports = []
+        self.lastseens = array('l')
+        self.activeseconds = array('l')
+        self.lastpaids = array('l')
+
+    @classmethod
+    def from_dynodelist(self, dnlist):
+        """ DynodeList from the `dynodelist full` dict. """
+        dynodes = self()
+        for (collateral, dnstring) in dnlist.items():
+            dynodes.append(collateral, dnstring)
+        return dynodes
+
+    def append(self, collateral, dnstring):
+        (status, protocol, address, ip_port, lastseen, activeseconds, lastpaid) = Dynode.parse_dn_string(dnstring)
+        (txid, vout_index) = Dynode.parse_collateral_string(collateral)
 
+        # normalised, e.g. no leading zeros on the index
+        self.vins.append(txid + '-' + str(int(vout_index)))
+        self.statuses.append(intern(str(status)))
+        self.protocols.append(int(protocol))
+        self.addresses.append(address)
         # TODO: break this out... take ipv6 into account
-        self.ip_port = ip_port
+        self.ip_ports.append(ip_port)
+        self.lastseens.append(int(lastseen))
+        self.activeseconds.append(int(activeseconds))
+        self.lastpaids.append(int(lastpaid))
+
+    def __len__(self):
+        return len(self.vins)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.vins)
+        if not 0 <= index < len(self.vins):
+            raise IndexError("dynode index out of range")
+        return Dynode.view(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.vins)):
+            yield Dynode.view(self, index)
 
-        self.lastseen = int(lastseen)
-        self.activeseconds = int(activeseconds)
-        self.lastpaid = int(lastpaid)
+    def vins_with_status(self, status):
+        return [vin for (vin, dn_status) in zip(self.vins, self.statuses) if dn_status == status]
+
+
+class Dynode(object):
+    """ A single dynode, a view onto a row of a DynodeList. """
+    __slots__ = ('dnlist', 'index')
+
+    def __init__(self, collateral, dnstring):
+        self.dnlist = DynodeList()
+        self.dnlist.append(collateral, dnstring)
+        self.index = 0
+
+    @classmethod
+    def view(self, dnlist, index):
+        dynode = self.__new__(self)
+        dynode.dnlist = dnlist
+        dynode.index = index
+        return dynode
 
     @classmethod
     def parse_collateral_string(self, collateral):
@@ -38,4 +102,40 @@ class Dynode():
 
     @property
     def vin(self):
-        return self.txid + '-' + str(self.vout_index)
+        return self.dnlist.vins[self.index]
+
+    @property
+    def txid(self):
+        return self.vin.split('-')[0]
+
+    @property
+    def vout_index(self):
+        return int(self.vin.split('-')[1])
+
+    @property
+    def status(self):
+        return self.dnlist.statuses[self.index]
+
+    @property
+    def protocol(self):
+        return self.dnlist.protocols[self.index]
+
+    @property
+    def address(self):
+        return self.dnlist.addresses[self.index]
+
+    @property
+    def ip_port(self):
+        return self.dnlist.ip_ports[self.index]
+
+    @property
+    def lastseen(self):
+        return self.dnlist.lastseens[self.index]
+
+    @property
+    def activeseconds(self):
+        return self.dnlist.activeseconds[self.index]
+
+    @property
+    def lastpaid(self):
+        return self.dnlist.lastpaids[self.index]
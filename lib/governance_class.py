@@ -13,6 +13,11 @@ import time
 class GovernanceClass(object):
     only_dynode_can_submit = False
 
+    # is_valid verdicts by object_hash, filled in while syncing so that this
+    # run needn't validate the objects again. Only good for the current run,
+    # --daemon mode clears them at the start of each one (see begin_run).
+    validity = {}
+
     # lazy
     @property
     def go(self):
@@ -26,19 +31,27 @@ class GovernanceClass(object):
     def voted_on(self, **kwargs):
         return self.go.voted_on(**kwargs)
 
-    def vote_validity(self, dynamicd):
-        if self.is_valid():
+    def cached_is_valid(self):
+        valid = GovernanceClass.validity.get(self.object_hash)
+        if valid is None:
+            valid = self.is_valid()
+        return valid
+
+    def validity_outcome(self):
+        if self.cached_is_valid():
             printdbg("Voting valid! %s: %d" % (self.__class__.__name__, self.id))
-            self.vote(dynamicd, models.VoteSignals.valid, models.VoteOutcomes.yes)
+            return models.VoteOutcomes.yes
         else:
             printdbg("Voting INVALID! %s: %d" % (self.__class__.__name__, self.id))
-            self.vote(dynamicd, models.VoteSignals.valid, models.VoteOutcomes.no)
+            return models.VoteOutcomes.no
+
+    def vote_validity(self, dynamicd):
+        self.vote(dynamicd, models.VoteSignals.valid, self.validity_outcome())
 
     def get_submit_command(self):
         object_fee_tx = self.go.object_fee_tx
 
-        import dynamiclib
-        obj_data = dynamiclib.SHIM_serialise_for_dynamicd(self.serialise())
+        obj_data = self.dynamicd_serialise()
 
         cmd = ['gobject', 'submit', '0', '1', str(int(time.time())), obj_data, object_fee_tx]
 
@@ -59,8 +72,7 @@ class GovernanceClass(object):
         return {self.object_hash: dikt}
 
     def get_submit_command(self):
-        import dynamiclib
-        obj_data = dynamiclib.SHIM_serialise_for_dynamicd(self.serialise())
+        obj_data = self.dynamicd_serialise()
 
         # new objects won't have parent_hash, revision, etc...
         cmd = ['gobject', 'submit', '0', '1', str(int(time.time())), obj_data]
@@ -84,20 +96,21 @@ class GovernanceClass(object):
         except JSONRPCException as e:
             print("Unable to submit: %s" % e.message)
 
-    def serialise(self):
+    # 'proposal', 'superblock', etc.
+    @classmethod
+    def govobj_name(self):
         import inflection
+        return inflection.singularize(self._meta.name)
+
+    def serialise(self):
         import binascii
         import simplejson
 
-        # 'proposal', 'superblock', etc.
-        name = self._meta.name
-        obj_type = inflection.singularize(name)
-
-        return binascii.hexlify(simplejson.dumps((obj_type, self.get_dict()), sort_keys=True).encode('utf-8')).decode('utf-8')
+        return binascii.hexlify(simplejson.dumps((self.govobj_name(), self.get_dict()), sort_keys=True).encode('utf-8')).decode('utf-8')
 
     def dynamicd_serialise(self):
         import dynamiclib
-        return dynamiclib.SHIM_serialise_for_dynamicd(self.serialise())
+        return dynamiclib.encode_dynamicd_gobject(self.govobj_name(), self.get_dict())
 
     @classmethod
     def serialisable_fields(self):
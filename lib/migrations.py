@@ -0,0 +1,70 @@
+"""
+Forward-only schema migrations.
+
+Each entry in MIGRATIONS upgrades the schema from the previous version to
+the version it's listed under, in place, so that an upgrade doesn't drop the
+tables (and with them our recorded votes). models.SCHEMA_VERSION must be the
+last version listed here.
+
+New tables don't need a migration step, models.check_db_sane creates any
+which are missing. Neither do indexes declared on the models, they're added
+to existing tables by models.check_db_indexes.
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+from peewee import CharField
+from playhouse.migrate import SchemaMigrator, migrate
+from misc import printdbg
+
+# oldest schema we know how to upgrade from
+BASE_SCHEMA_VERSION = '20170111-1'
+
+
+# Columns are added as nullable: making them NOT NULL afterwards means
+# rebuilding the table on SQLite, which would leave the votes table's foreign
+# key pointing at the dropped copy.
+def add_object_fingerprint(migrator):
+    # existing rows are left NULL, so the next sync re-imports them once and
+    # fills the fingerprint in
+    migrate(
+        migrator.add_column('governance_objects', 'object_fingerprint', CharField(max_length=64, null=True)),
+    )
+
+
+MIGRATIONS = [
+    ('20261018-1', add_object_fingerprint),
+]
+
+
+# 'YYYYMMDD-NUM' => (YYYYMMDD, NUM), so that versions sort correctly
+def version_key(version):
+    (date, num) = version.split('-')
+    return (int(date), int(num))
+
+
+def can_migrate(db_schema_version):
+    known = [BASE_SCHEMA_VERSION] + [version for (version, step) in MIGRATIONS]
+    return db_schema_version in known
+
+
+def pending_migrations(db_schema_version):
+    current = version_key(db_schema_version)
+    return [(version, step) for (version, step) in MIGRATIONS if version_key(version) > current]
+
+
+def run_migrations(db, db_schema_version, on_migrated):
+    """
+    Apply every migration newer than db_schema_version, in order.
+
+    on_migrated(version) is called after each step, so that an interrupted
+    upgrade resumes from where it stopped.
+    """
+    migrator = SchemaMigrator.from_database(db)
+
+    for (version, step) in pending_migrations(db_schema_version):
+        printdbg("[info]: Migrating DB schema to [%s] (%s)" % (version, step.__name__))
+        with db.atomic():
+            step(migrator)
+            on_migrated(version)
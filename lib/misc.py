@@ -3,6 +3,7 @@ from datetime import datetime
 import re
 import sys
 import os
+from collections import OrderedDict
 
 
 def is_numeric(strin):
@@ -41,9 +42,40 @@ def epoch2str(epoch):
     return datetime.utcfromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S")
 
 
+# split a list into lists of at most size elements
+def chunks(lizt, size):
+    for i in range(0, len(lizt), size):
+        yield lizt[i:i + size]
+
+
 class Bunch(object):
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
 
     def get(self, name):
         return self.__dict__.get(name, None)
+
+
+class LRUCache(object):
+    """ Bounded dict, the least recently used entry is dropped when full. """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            return default
+        self.entries[key] = value
+        return value
+
+    def set(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
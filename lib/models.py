@@ -42,7 +42,15 @@ DYNAMICD_GOVOBJ_TYPES = {
 #
 # NUM is a numerical version of changes for that specific date. If the date
 # changes, the NUM resets to 1.
-SCHEMA_VERSION = '20170111-1'
+SCHEMA_VERSION = '20261018-1'
+
+# SQLite's default limit on bound parameters in a single statement, and a
+# safe batch size for the other backends
+SQL_MAX_VARIABLES = 999
+
+# setting recorded once our votes have been picked up from the network, see
+# GovernanceObject.sync_network_votes
+NETWORK_VOTES_SYNCED = 'NETWORK_VOTES_SYNCED'
 
 # === models ===
 
@@ -59,7 +67,7 @@ class BaseModel(playhouse.signals.Model):
 class GovernanceObject(BaseModel):
     parent_id = IntegerField(default=0)
     object_creation_time = IntegerField(default=int(time.time()))
-    object_hash = CharField(max_length=64)
+    object_hash = CharField(max_length=64, unique=True)
     object_parent_hash = CharField(default='0')
     object_type = IntegerField(default=0)
     object_revision = IntegerField(default=1)
@@ -68,6 +76,7 @@ class GovernanceObject(BaseModel):
     no_count = IntegerField(default=0)
     abstain_count = IntegerField(default=0)
     absolute_yes_count = IntegerField(default=0)
+    object_fingerprint = CharField(max_length=64, default='')
 
     class Meta:
         db_table = 'governance_objects'
@@ -75,28 +84,137 @@ class GovernanceObject(BaseModel):
     # sync dynamicd gobject list with our local relational DB backend
     @classmethod
     def sync(self, dynamicd):
+        import dynamiclib
+
         golist = dynamicd.rpc_command('gobject', 'list')
 
-        # objects which are removed from the network should be removed from the DB
+        invalid = []
         try:
-            for purged in self.purged_network_objects(list(golist.keys())):
+            known = self.known_fingerprints()
+            changed = []
+            vote_count_updates = []
+            skipped = 0
+            for item in golist.values():
+                fingerprint = dynamiclib.gobject_fingerprint(item)
+                (go_id, go_fingerprint, go_vote_counts) = known.get(item['Hash'], (None, None, None))
+
+                # object data unchanged since last import, at most the vote
+                # counts have moved
+                if fingerprint == go_fingerprint:
+                    vote_counts = self.vote_counts_from_dynamicd(item)
+                    if vote_counts != go_vote_counts:
+                        vote_count_updates.append((go_id, vote_counts))
+                    else:
+                        skipped += 1
+                    continue
+
+                changed.append(item)
+
+            # CPU bound, so done before the DB is locked (and possibly in
+            # worker processes, see sync_workers in sentinel.conf)
+            parsed = self.parse_gobjects_from_dynamicd(changed)
+
+            # one transaction for the whole import, rather than one per
+            # statement
+            with db.atomic():
+                # objects which are removed from the network should be removed from the DB
                 # SOMEDAY: possible archive step here
-                purged.delete_instance(recursive=True, delete_nullable=True)
+                self.purge_network_removed(list(golist.keys()))
 
-            for item in golist.values():
-                (go, subobj) = self.import_gobject_from_dynamicd(dynamicd, item)
+                for (go_id, vote_counts) in vote_count_updates:
+                    self.update(**vote_counts).where(self.id == go_id).execute()
+
+                invalid = self.store_parsed_gobjects(parsed)
+
+            printdbg("%d of %d gobjects unchanged since last sync" % (skipped, len(golist)))
         except (peewee.InternalError, peewee.OperationalError, peewee.ProgrammingError) as e:
             printdbg("Got an error upon import: %s" % e)
 
+        # vote outside of the import transaction, so that the DB isn't locked
+        # during the RPC round trips
+        if invalid:
+            self.vote_delete(dynamicd, invalid)
+
+            # an unchanged object is skipped on the next sync, unless our
+            # delete vote didn't get through, so that it's voted on again
+            outstanding = [govobj.id for govobj in invalid
+                           if not govobj.voted_on(signal=VoteSignals.delete, outcome=VoteOutcomes.yes)]
+            if outstanding:
+                self.update(object_fingerprint='').where(self.id << outstanding).execute()
+
+    # queue delete votes on govobjs dynamicd handed us invalid data for, they
+    # are retried later like any other vote if they don't get through
     @classmethod
-    def purged_network_objects(self, network_object_hashes):
-        query = self.select()
-        if network_object_hashes:
-            query = query.where(~(self.object_hash << network_object_hashes))
-        return query
+    def vote_delete(self, dynamicd, govobjs):
+        from vote_dispatcher import VoteDispatcher
+
+        dispatcher = VoteDispatcher.from_config(dynamicd)
+        for govobj in govobjs:
+            dispatcher.enqueue(govobj, VoteSignals.delete, VoteOutcomes.yes)
+        dispatcher.dispatch()
 
+    # object_hash => (id, fingerprint, vote counts) for every govobj in the DB
     @classmethod
-    def import_gobject_from_dynamicd(self, dynamicd, rec):
+    def known_fingerprints(self):
+        query = self.select(
+            self.id,
+            self.object_hash,
+            self.object_fingerprint,
+            self.absolute_yes_count,
+            self.abstain_count,
+            self.yes_count,
+            self.no_count,
+        ).tuples()
+
+        known = {}
+        for (go_id, object_hash, fingerprint, absolute_yes, abstain, yes, no) in query:
+            vote_counts = {
+                'absolute_yes_count': absolute_yes,
+                'abstain_count': abstain,
+                'yes_count': yes,
+                'no_count': no,
+            }
+            known[object_hash] = (go_id, fingerprint, vote_counts)
+
+        return known
+
+    @classmethod
+    def vote_counts_from_dynamicd(self, rec):
+        return {
+            'absolute_yes_count': rec['AbsoluteYesCount'],
+            'abstain_count': rec['AbstainCount'],
+            'yes_count': rec['YesCount'],
+            'no_count': rec['NoCount'],
+        }
+
+    @classmethod
+    def purge_network_removed(self, network_object_hashes):
+        """
+        Delete every govobj which is no longer on the network, along with
+        everything that references it (votes, proposals, superblocks,
+        watchdogs).
+
+        The live hashes are staged in a temporary table, so this is a fixed
+        number of set-based DELETEs however many objects there are. Run it
+        inside a transaction.
+        """
+        LiveObjectHash.stage(network_object_hashes)
+
+        live = LiveObjectHash.select(LiveObjectHash.object_hash)
+        stale = self.select(self.id).where(~(self.object_hash << live))
+
+        for fk in self._meta.reverse_rel.values():
+            fk.model_class.delete().where(fk << stale).execute()
+
+        count = self.delete().where(~(self.object_hash << live)).execute()
+        if count:
+            printdbg("govobjs purged = %d" % count)
+            vote_index.reload()
+        return count
+
+    # convert a "gobject list" entry into (govobj fields, subclass, subclass fields)
+    @classmethod
+    def parse_gobject_from_dynamicd(self, rec):
         import dynamiclib
         import inflection
 
@@ -106,18 +224,12 @@ class GovernanceObject(BaseModel):
         gobj_dict = {
             'object_hash': object_hash,
             'object_fee_tx': rec['CollateralHash'],
-            'absolute_yes_count': rec['AbsoluteYesCount'],
-            'abstain_count': rec['AbstainCount'],
-            'yes_count': rec['YesCount'],
-            'no_count': rec['NoCount'],
+            'object_fingerprint': dynamiclib.gobject_fingerprint(rec),
         }
+        gobj_dict.update(self.vote_counts_from_dynamicd(rec))
 
         # shim/dynamicd conversion
-        object_hex = dynamiclib.SHIM_deserialise_from_dynamicd(object_hex)
-        objects = dynamiclib.deserialise(object_hex)
-        subobj = None
-
-        obj_type, dikt = objects[0:2:1]
+        (obj_type, dikt) = dynamiclib.decode_dynamicd_gobject(object_hex)
         obj_type = inflection.pluralize(obj_type)
         subclass = self._meta.reverse_rel[obj_type].model_class
 
@@ -127,6 +239,15 @@ class GovernanceObject(BaseModel):
         # exclude any invalid model data from dynamicd...
         valid_keys = subclass.serialisable_fields()
         subdikt = {k: dikt[k] for k in valid_keys if k in dikt}
+        subdikt['object_hash'] = object_hash
+
+        return (gobj_dict, subclass, subdikt)
+
+    @classmethod
+    def import_gobject_from_dynamicd(self, dynamicd, rec):
+        (gobj_dict, subclass, subdikt) = self.parse_gobject_from_dynamicd(rec)
+        object_hash = gobj_dict['object_hash']
+        subobj = None
 
         # get/create, then sync vote counts from dynamicd, with every run
         govobj, created = self.get_or_create(object_hash=object_hash, defaults=gobj_dict)
@@ -143,8 +264,7 @@ class GovernanceObject(BaseModel):
         except (peewee.OperationalError, peewee.IntegrityError) as e:
             # in this case, vote as delete, and log the vote in the DB
             printdbg("Got invalid object from dynamicd! %s" % e)
-            if not govobj.voted_on(signal=VoteSignals.delete, outcome=VoteOutcomes.yes):
-                govobj.vote(dynamicd, VoteSignals.delete, VoteOutcomes.yes)
+            self.vote_delete(dynamicd, [govobj])
             return (govobj, None)
 
         if created:
@@ -156,34 +276,148 @@ class GovernanceObject(BaseModel):
         # ATM, returns a tuple w/gov attributes and the govobj
         return (govobj, subobj)
 
+    @classmethod
+    def parse_gobjects_from_dynamicd(self, records):
+        """
+        Decode and validate many "gobject list" entries, fanned out to a
+        process pool when sync_workers is set in sentinel.conf and there is
+        enough work to be worth it.
+
+        Returns (govobj fields, subclass, subclass fields) tuples.
+        """
+        workers = int(config.sentinel_cfg.get('sync_workers', 0))
+        chunk_size = int(config.sentinel_cfg.get('sync_chunk_size', 100))
+
+        if workers > 1 and len(records) > chunk_size:
+            import multiprocessing
+            printdbg("decoding %d gobjects with %d workers" % (len(records), workers))
+            pool = multiprocessing.Pool(workers)
+            try:
+                results = pool.map(decode_and_validate_gobject, records, chunk_size)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [decode_and_validate_gobject(rec) for rec in records]
+
+        parsed = []
+        for (gobj_dict, subclass, subdikt, valid) in results:
+            if valid is not None:
+                GovernanceClass.validity[gobj_dict['object_hash']] = valid
+            parsed.append((gobj_dict, subclass, subdikt))
+
+        return parsed
+
+    @classmethod
+    def import_gobjects_from_dynamicd(self, records):
+        """
+        Bulk version of import_gobject_from_dynamicd, run it inside a
+        transaction.
+
+        Returns the govobjs dynamicd handed us invalid data for, which the
+        caller should vote to delete.
+        """
+        return self.store_parsed_gobjects(self.parse_gobjects_from_dynamicd(records))
+
+    @classmethod
+    def store_parsed_gobjects(self, parsed):
+        """
+        New governance objects are written with multi-row INSERTs; existing
+        ones are updated in place, as they own the recorded votes and must
+        keep their ids. Subclass rows (proposals, superblocks, watchdogs) are
+        replaced per model with one DELETE and multi-row INSERTs.
+
+        Returns the govobjs which couldn't be stored.
+        """
+        if not parsed:
+            return []
+
+        object_hashes = [gobj_dict['object_hash'] for (gobj_dict, subclass, subdikt) in parsed]
+        go_ids = self.ids_for_hashes(object_hashes)
+
+        new_rows = []
+        for (gobj_dict, subclass, subdikt) in parsed:
+            go_id = go_ids.get(gobj_dict['object_hash'])
+            if go_id is None:
+                new_rows.append(gobj_dict)
+            else:
+                self.update(**gobj_dict).where(self.id == go_id).execute()
+
+        bulk_insert(self, new_rows)
+        printdbg("govobjs created = %d, updated = %d" % (len(new_rows), len(parsed) - len(new_rows)))
+
+        go_ids.update(self.ids_for_hashes([row['object_hash'] for row in new_rows]))
+
+        # group subobjects by model, running the pre_save hooks a save() would
+        subrows = {}
+        for (gobj_dict, subclass, subdikt) in parsed:
+            go_id = go_ids.get(gobj_dict['object_hash'])
+            # the govobj row itself was rejected, nothing to attach it to
+            if go_id is None:
+                continue
+            subdikt['governance_object'] = go_id
+            subobj = subclass(**subdikt)
+            playhouse.signals.pre_save.send(subobj, created=True)
+
+            # every row needs the same columns, missing required data is left
+            # for the NOT NULL constraint to reject
+            row = {name: subobj._data.get(name) for name in subclass._meta.fields if name != 'id'}
+            subrows.setdefault(subclass, []).append(row)
+
+        invalid_hashes = []
+        for (subclass, rows) in subrows.items():
+            for chunk in misc.chunks([row['object_hash'] for row in rows], SQL_MAX_VARIABLES):
+                subclass.delete().where(subclass.object_hash << chunk).execute()
+            invalid_hashes.extend(bulk_insert(subclass, rows))
+
+        if invalid_hashes:
+            return list(self.select().where(self.object_hash << invalid_hashes))
+        return []
+
+    @classmethod
+    def ids_for_hashes(self, object_hashes):
+        go_ids = {}
+        for chunk in misc.chunks(object_hashes, SQL_MAX_VARIABLES):
+            query = self.select(self.object_hash, self.id).where(self.object_hash << chunk)
+            go_ids.update(dict(query.tuples()))
+        return go_ids
+
     def get_vote_command(self, signal, outcome):
         cmd = ['gobject', 'vote-conf', self.object_hash,
                signal.name, outcome.name]
         return cmd
 
     def vote(self, dynamicd, signal, outcome):
-        import dynamiclib
+        vote_command = self.prepare_vote(signal, outcome)
+        if not vote_command:
+            return
+
+        output = dynamicd.rpc_command(*vote_command)
+        self.record_vote(dynamicd, signal, outcome, output)
 
+    # returns the RPC command casting this vote, or None if there's nothing
+    # to vote on / we've already voted the same way
+    def prepare_vote(self, signal, outcome):
         # At this point, will probably never reach here. But doesn't hurt to
         # have an extra check just in case objects get out of sync (people will
         # muck with the DB).
         if (self.object_hash == '0' or not misc.is_hash(self.object_hash)):
             printdbg("No governance object hash, nothing to vote on.")
-            return
+            return None
 
         # have I already voted on this gobject with this particular signal and outcome?
         if self.voted_on(signal=signal):
             printdbg("Found a vote for this gobject/signal...")
-            vote = self.votes.where(Vote.signal == signal)[0]
 
             # if the outcome is the same, move on, nothing more to do
-            if vote.outcome == outcome:
+            if self.voted_on(signal=signal, outcome=outcome):
                 # move on.
                 printdbg("Already voted for this same gobject/signal/outcome, no need to re-vote.")
-                return
+                return None
             else:
                 printdbg("Found a STALE vote for this gobject/signal, deleting so that we can re-vote.")
-                vote.delete_instance()
+                for vote in self.votes.where(Vote.signal == signal):
+                    vote.delete_instance()
 
         else:
             printdbg("Haven't voted on this gobject/signal yet...")
@@ -192,7 +426,11 @@ class GovernanceObject(BaseModel):
 
         vote_command = self.get_vote_command(signal, outcome)
         printdbg(' '.join(vote_command))
-        output = dynamicd.rpc_command(*vote_command)
+        return vote_command
+
+    # output is dynamicd's answer to the prepare_vote command
+    def record_vote(self, dynamicd, signal, outcome, output):
+        import dynamiclib
 
         # extract vote output parsing to external lib
         voted = dynamiclib.did_we_vote(output)
@@ -221,10 +459,62 @@ class GovernanceObject(BaseModel):
             Vote(governance_object=self, signal=signal, outcome=outcome,
                  object_hash=self.object_hash).save()
 
+    @classmethod
+    def sync_network_votes(self, dynamicd):
+        """
+        Record every vote of ours the network has on our govobjs, which we
+        don't have locally, e.g. after a fresh install. All the votes are
+        fetched in batched requests and recorded in one transaction.
+
+        Once every vote could be fetched, this is recorded in a setting, see
+        network_votes_synced.
+
+        Returns the number of votes recorded.
+        """
+        # not a dynode (yet), there are no votes of ours to fetch
+        if not dynamicd.get_current_dynode_vin():
+            return 0
+
+        govobjs = dict(self.select(self.object_hash, self.id).tuples())
+        failed = dynamicd.prefetch_my_gobject_votes(list(govobjs.keys()))
+
+        recorded = set(Vote.select(Vote.governance_object, Vote.signal).tuples())
+        signals = {signal.name: signal.id for signal in Signal.select()}
+        outcomes = {outcome.name: outcome.id for outcome in Outcome.select()}
+
+        rows = []
+        for (object_hash, go_id) in govobjs.items():
+            for vdikt in dynamicd.get_my_gobject_votes(object_hash):
+                signal_id = signals.get(vdikt['signal'])
+                outcome_id = outcomes.get(vdikt['outcome'])
+                if not (signal_id and outcome_id) or (go_id, signal_id) in recorded:
+                    continue
+
+                recorded.add((go_id, signal_id))
+                rows.append({'governance_object': go_id, 'signal': signal_id,
+                             'outcome': outcome_id, 'object_hash': object_hash})
+
+        with db.atomic():
+            bulk_insert(Vote, rows)
+            if not failed:
+                Setting.get_or_create(name=NETWORK_VOTES_SYNCED, defaults={'value': '1'})
+
+        if rows:
+            printdbg("synced %d votes from the network" % len(rows))
+            vote_index.reload()
+        return len(rows)
+
+    @classmethod
+    def network_votes_synced(self):
+        return Setting.select().where(Setting.name == NETWORK_VOTES_SYNCED).exists()
+
     def voted_on(self, **kwargs):
         signal = kwargs.get('signal', None)
         outcome = kwargs.get('outcome', None)
 
+        if signal and vote_index.is_loaded():
+            return vote_index.count(self.id, signal, outcome)
+
         query = self.votes
 
         if signal:
@@ -238,10 +528,11 @@ class GovernanceObject(BaseModel):
 
 
 class Setting(BaseModel):
-    name = CharField(default='')
+    name = CharField(default='', unique=True)
     value = CharField(default='')
-    created_at = DateTimeField(default=datetime.datetime.utcnow())
-    updated_at = DateTimeField(default=datetime.datetime.utcnow())
+    # callables, transients expire relative to created_at
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.datetime.utcnow)
 
     class Meta:
         db_table = 'settings'
@@ -255,7 +546,7 @@ class Proposal(GovernanceClass, BaseModel):
     end_epoch = IntegerField()
     payment_address = CharField(max_length=36)
     payment_amount = DecimalField(max_digits=16, decimal_places=8)
-    object_hash = CharField(max_length=64)
+    object_hash = CharField(max_length=64, unique=True)
 
     govobj_type = DYNAMICD_GOVOBJ_TYPES['proposal']
 
@@ -289,7 +580,7 @@ class Proposal(GovernanceClass, BaseModel):
                 return False
 
             # payment address is valid base58 dynamic addr, non-multisig
-            if not dynamiclib.is_valid_dynamic_address(self.payment_address, config.network):
+            if not dynamiclib.validate_dynamic_addresses([self.payment_address], config.network)[0]:
                 printdbg("\tPayment address [%s] not a valid Dynamic address for network [%s], returning False" % (self.payment_address, config.network))
                 return False
 
@@ -349,7 +640,7 @@ class Proposal(GovernanceClass, BaseModel):
         ranked = []
         for proposal in query:
             proposal.max_budget = next_superblock_max_budget
-            if proposal.is_valid():
+            if proposal.cached_is_valid():
                 ranked.append(proposal)
 
         return ranked
@@ -362,8 +653,7 @@ class Proposal(GovernanceClass, BaseModel):
             return rank
 
     def get_prepare_command(self):
-        import dynamiclib
-        obj_data = dynamiclib.SHIM_serialise_for_dynamicd(self.serialise())
+        obj_data = self.dynamicd_serialise()
 
         # new superblocks won't have parent_hash, revision, etc...
         cmd = ['gobject', 'prepare', '0', '1', str(int(time.time())), obj_data]
@@ -386,12 +676,12 @@ class Proposal(GovernanceClass, BaseModel):
 
 class Superblock(BaseModel, GovernanceClass):
     governance_object = ForeignKeyField(GovernanceObject, related_name='superblocks', on_delete='CASCADE', on_update='CASCADE')
-    event_block_height = IntegerField()
+    event_block_height = IntegerField(index=True)
     payment_addresses = TextField()
     payment_amounts = TextField()
     proposal_hashes = TextField(default='')
-    sb_hash = CharField()
-    object_hash = CharField(max_length=64)
+    sb_hash = CharField(index=True)
+    object_hash = CharField(max_length=64, unique=True)
 
     govobj_type = DYNAMICD_GOVOBJ_TYPES['superblock']
     only_dynode_can_submit = True
@@ -407,8 +697,9 @@ class Superblock(BaseModel, GovernanceClass):
 
         # it's a string from the DB...
         addresses = self.payment_addresses.split('|')
-        for addr in addresses:
-            if not dynamiclib.is_valid_dynamic_address(addr, config.network):
+        verdicts = dynamiclib.validate_dynamic_addresses(addresses, config.network)
+        for (addr, valid) in zip(addresses, verdicts):
+            if not valid:
                 printdbg("\tInvalid address [%s], returning False" % addr)
                 return False
 
@@ -509,7 +800,7 @@ class Superblock(BaseModel, GovernanceClass):
 
 # ok, this is an awkward way to implement these...
 # "hook" into the Superblock model and run this code just before any save()
-from playhouse.signals import pre_save
+from playhouse.signals import pre_save, post_save, post_delete
 
 
 @pre_save(sender=Superblock)
@@ -519,8 +810,8 @@ def on_save_handler(model_class, instance, created):
 
 class Signal(BaseModel):
     name = CharField(unique=True)
-    created_at = DateTimeField(default=datetime.datetime.utcnow())
-    updated_at = DateTimeField(default=datetime.datetime.utcnow())
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.datetime.utcnow)
 
     class Meta:
         db_table = 'signals'
@@ -528,8 +819,8 @@ class Signal(BaseModel):
 
 class Outcome(BaseModel):
     name = CharField(unique=True)
-    created_at = DateTimeField(default=datetime.datetime.utcnow())
-    updated_at = DateTimeField(default=datetime.datetime.utcnow())
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.datetime.utcnow)
 
     class Meta:
         db_table = 'outcomes'
@@ -539,19 +830,246 @@ class Vote(BaseModel):
     governance_object = ForeignKeyField(GovernanceObject, related_name='votes', on_delete='CASCADE', on_update='CASCADE')
     signal = ForeignKeyField(Signal, related_name='votes', on_delete='CASCADE', on_update='CASCADE')
     outcome = ForeignKeyField(Outcome, related_name='votes', on_delete='CASCADE', on_update='CASCADE')
-    voted_at = DateTimeField(default=datetime.datetime.utcnow())
-    created_at = DateTimeField(default=datetime.datetime.utcnow())
-    updated_at = DateTimeField(default=datetime.datetime.utcnow())
+    voted_at = DateTimeField(default=datetime.datetime.utcnow)
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.datetime.utcnow)
     object_hash = CharField(max_length=64)
 
     class Meta:
         db_table = 'votes'
+        indexes = (
+            (('governance_object', 'signal'), False),
+        )
+
+
+class PendingVote(BaseModel):
+    """
+    A vote we've decided to cast but haven't got through to dynamicd yet,
+    see vote_dispatcher. Kept in the DB so that a vote which failed or was
+    rate-limited is retried on a later run.
+    """
+    governance_object = ForeignKeyField(GovernanceObject, related_name='pending_votes', on_delete='CASCADE', on_update='CASCADE')
+    signal = ForeignKeyField(Signal, related_name='pending_votes', on_delete='CASCADE', on_update='CASCADE')
+    outcome = ForeignKeyField(Outcome, related_name='pending_votes', on_delete='CASCADE', on_update='CASCADE')
+    object_hash = CharField(max_length=64)
+    attempts = IntegerField(default=0)
+    # epoch, not retried before then
+    next_attempt_at = IntegerField(default=0)
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+
+    class Meta:
+        db_table = 'pending_votes'
+        indexes = (
+            # only the latest decision per object/signal is kept
+            (('governance_object', 'signal'), True),
+        )
+
+    @classmethod
+    def due(self, now):
+        return self.select().where(self.next_attempt_at <= now).order_by(self.id)
+
+
+class BlockTime(BaseModel):
+    """
+    Timestamps of mined blocks, see DynamicDaemon.block_height_to_epoch.
+    The block hash is kept so that an entry near the tip can be checked
+    against the current chain in case of a reorg.
+    """
+    height = IntegerField(unique=True)
+    block_hash = CharField(max_length=64)
+    time = IntegerField()
+
+    class Meta:
+        db_table = 'block_times'
+
+    @classmethod
+    def lookup(self, height, block_hash=None):
+        # => block time, or None if unknown (or from another chain)
+        try:
+            entry = self.get(self.height == height)
+        except self.DoesNotExist:
+            return None
+
+        if block_hash is not None and entry.block_hash != block_hash:
+            return None
+        return entry.time
+
+    @classmethod
+    def record(self, height, block_hash, time):
+        with db.atomic():
+            self.delete().where(self.height == height).execute()
+            self.create(height=height, block_hash=block_hash, time=time)
+
+
+class DynodeEntry(BaseModel):
+    """
+    Our local view of the dynode list, kept up to date by
+    DynodeRegistry.sync. Only the fields which identify a dynode and its
+    status are stored, not lastseen & co which change on every ping.
+    """
+    vin = CharField(max_length=80, unique=True)
+    status = CharField(max_length=32, index=True)
+    protocol = IntegerField(default=0)
+    address = CharField(max_length=64, default='')
+    ip_port = CharField(max_length=64, default='')
+    updated_at = DateTimeField(default=datetime.datetime.utcnow)
+
+    class Meta:
+        db_table = 'dynodes'
+
+
+class DynodeRegistry(object):
+    """
+    In-memory vin => (status, protocol, address, ip_port) index of the
+    dynodes table, updated from `dynodelist full` output by applying only the
+    differences: new dynodes are inserted, gone ones deleted and changed ones
+    updated. Entries whose raw string is the same as at the previous sync
+    aren't parsed again.
+    """
+
+    def __init__(self):
+        self.dynodes = None
+        # vin => raw `dynodelist full` string, as of the last sync
+        self.raw_strings = {}
+
+    def is_loaded(self):
+        return self.dynodes is not None
+
+    def load(self):
+        query = DynodeEntry.select(DynodeEntry.vin, DynodeEntry.status, DynodeEntry.protocol,
+                                   DynodeEntry.address, DynodeEntry.ip_port).tuples()
+        self.dynodes = {row[0]: row[1:] for row in query}
+        self.raw_strings = {}
+        printdbg("dynode registry loaded, %d dynodes" % len(self.dynodes))
+
+    def sync(self, dnlist):
+        """
+        Apply `dynodelist full` output (collateral => string).
+
+        Returns the (added, removed, changed) vins.
+        """
+        from dynode import Dynode
+
+        if not self.is_loaded():
+            self.load()
+
+        (added, changed, raw_strings) = ([], [], {})
+        for (collateral, dnstring) in dnlist.items():
+            (txid, vout_index) = Dynode.parse_collateral_string(collateral)
+            vin = txid + '-' + str(int(vout_index))
+            raw_strings[vin] = dnstring
+            if self.raw_strings.get(vin) == dnstring:
+                continue
+
+            (status, protocol, address, ip_port, lastseen, activeseconds, lastpaid) = Dynode.parse_dn_string(dnstring)
+            fields = (status, int(protocol), address, ip_port)
+            known = self.dynodes.get(vin)
+            if known is None:
+                added.append(vin)
+            elif known != fields:
+                changed.append(vin)
+            self.dynodes[vin] = fields
+
+        removed = [vin for vin in self.dynodes if vin not in raw_strings]
+        for vin in removed:
+            del self.dynodes[vin]
+        self.raw_strings = raw_strings
+
+        self.save(added, removed, changed)
+        if added or removed or changed:
+            printdbg("dynode registry: %d new, %d removed, %d changed" % (len(added), len(removed), len(changed)))
+
+        return (added, removed, changed)
+
+    def save(self, added, removed, changed):
+        columns = ('status', 'protocol', 'address', 'ip_port')
+        now = datetime.datetime.utcnow()
+
+        with db.atomic():
+            for vins in misc.chunks(removed, 500):
+                DynodeEntry.delete().where(DynodeEntry.vin << vins).execute()
+            for vin in changed:
+                fields = dict(zip(columns, self.dynodes[vin]), updated_at=now)
+                DynodeEntry.update(**fields).where(DynodeEntry.vin == vin).execute()
+            bulk_insert(DynodeEntry, [dict(zip(columns, self.dynodes[vin]), vin=vin, updated_at=now) for vin in added])
+
+    def is_enabled(self, vin):
+        if not self.is_loaded():
+            self.load()
+        fields = self.dynodes.get(vin)
+        return fields is not None and fields[0] == 'ENABLED'
+
+    def enabled_vins(self):
+        if not self.is_loaded():
+            self.load()
+        return [vin for (vin, fields) in self.dynodes.items() if fields[0] == 'ENABLED']
+
+
+dynode_registry = DynodeRegistry()
+
+
+class VoteIndex(object):
+    """
+    In-memory (govobj id, signal) => outcome index of our recorded votes.
+
+    Loaded with a single query at the start of a run, after which voted_on
+    is a dict lookup instead of a COUNT query per object. Vote saves and
+    deletes keep it up to date (see the signal handlers below); bulk deletes
+    must reload it.
+    """
+
+    def __init__(self):
+        self.outcomes = None
+
+    def is_loaded(self):
+        return self.outcomes is not None
+
+    def load(self):
+        query = Vote.select(Vote.governance_object, Vote.signal, Vote.outcome).tuples()
+        self.outcomes = {(go_id, signal_id): outcome_id for (go_id, signal_id, outcome_id) in query}
+        printdbg("vote index loaded, %d votes" % len(self.outcomes))
+
+    def reload(self):
+        if self.is_loaded():
+            self.load()
+
+    def unload(self):
+        self.outcomes = None
+
+    def count(self, go_id, signal, outcome=None):
+        outcome_id = self.outcomes.get((go_id, signal.id))
+        if outcome_id is None:
+            return 0
+        if outcome and outcome.id != outcome_id:
+            return 0
+        return 1
+
+    def record(self, vote):
+        if self.is_loaded():
+            self.outcomes[(vote._data['governance_object'], vote._data['signal'])] = vote._data['outcome']
+
+    def forget(self, vote):
+        if self.is_loaded():
+            self.outcomes.pop((vote._data['governance_object'], vote._data['signal']), None)
+
+
+vote_index = VoteIndex()
+
+
+@post_save(sender=Vote)
+def on_vote_save_handler(model_class, instance, created):
+    vote_index.record(instance)
+
+
+@post_delete(sender=Vote)
+def on_vote_delete_handler(model_class, instance):
+    vote_index.forget(instance)
 
 
 class Watchdog(BaseModel, GovernanceClass):
     governance_object = ForeignKeyField(GovernanceObject, related_name='watchdogs')
-    created_at = IntegerField()
-    object_hash = CharField(max_length=64)
+    created_at = IntegerField(index=True)
+    object_hash = CharField(max_length=64, unique=True)
 
     govobj_type = DYNAMICD_GOVOBJ_TYPES['watchdog']
     only_dynode_can_submit = True
@@ -592,6 +1110,26 @@ class Watchdog(BaseModel, GovernanceClass):
         db_table = 'watchdogs'
 
 
+# scratch table holding the object hashes in the current "gobject list",
+# private to the DB connection and never created by check_db_sane
+class LiveObjectHash(BaseModel):
+    object_hash = CharField(max_length=64, primary_key=True)
+
+    class Meta:
+        db_table = 'tmp_live_object_hashes'
+
+    @classmethod
+    def stage(self, object_hashes):
+        db.execute_sql(
+            'CREATE TEMPORARY TABLE IF NOT EXISTS %s (object_hash VARCHAR(64) NOT NULL PRIMARY KEY)'
+            % self._meta.db_table
+        )
+        self.delete().execute()
+
+        for chunk in misc.chunks(list(set(object_hashes)), SQL_MAX_VARIABLES):
+            self.insert_many([{'object_hash': h} for h in chunk]).execute()
+
+
 class Transient(object):
 
     def __init__(self, **kwargs):
@@ -674,6 +1212,67 @@ class Transient(object):
 # === /models ===
 
 
+# process pool worker for GovernanceObject.parse_gobjects_from_dynamicd, must
+# be a module-level function so that it can be pickled
+def decode_and_validate_gobject(rec):
+    (gobj_dict, subclass, subdikt) = GovernanceObject.parse_gobject_from_dynamicd(rec)
+
+    # watchdog validity depends on the current time, don't record it
+    valid = None
+    if subclass in (Proposal, Superblock):
+        try:
+            # validated as it will be when loaded back from the DB
+            valid = subclass(**coerce_fields(subclass, subdikt)).is_valid()
+        except Exception as e:
+            printdbg("Unable to validate %s: %s" % (gobj_dict['object_hash'], e))
+
+    return (gobj_dict, subclass, subdikt, valid)
+
+
+# field values as the model would load them from the DB, e.g. numeric strings
+# become ints and Decimals
+def coerce_fields(model, dikt):
+    coerced = {}
+    for (name, value) in dikt.items():
+        field = model._meta.fields.get(name)
+        if field is not None and value is not None:
+            try:
+                value = field.python_value(field.db_value(value))
+            except (TypeError, ValueError, ArithmeticError):
+                # left for is_valid to reject
+                pass
+        coerced[name] = value
+    return coerced
+
+
+def bulk_insert(model, rows):
+    """
+    Insert rows with multi-row INSERTs. A batch which violates a constraint
+    is retried row by row, and the object_hash of each row which can't be
+    inserted is returned.
+    """
+    rejected = []
+    if not rows:
+        return rejected
+
+    batch_size = max(1, SQL_MAX_VARIABLES // len(model._meta.fields))
+    for batch in misc.chunks(rows, batch_size):
+        try:
+            with db.atomic():
+                model.insert_many(batch).execute()
+        except (peewee.OperationalError, peewee.IntegrityError) as e:
+            printdbg("Bulk insert into %s failed, retrying row by row: %s" % (model._meta.db_table, e))
+            for row in batch:
+                try:
+                    with db.atomic():
+                        model.insert(**row).execute()
+                except (peewee.OperationalError, peewee.IntegrityError) as e:
+                    printdbg("Got invalid object from dynamicd! %s" % e)
+                    rejected.append(row['object_hash'])
+
+    return rejected
+
+
 def load_db_seeds():
     rows_created = 0
 
@@ -700,7 +1299,10 @@ def db_models():
         Signal,
         Outcome,
         Vote,
-        Watchdog
+        Watchdog,
+        PendingVote,
+        BlockTime,
+        DynodeEntry,
     ]
     return models
 
@@ -723,11 +1325,47 @@ def check_db_sane():
         except (peewee.InternalError, peewee.OperationalError, peewee.ProgrammingError) as e:
             print("[error] Could not create tables: %s" % e)
 
+    check_db_indexes()
     update_schema_version()
 
 
+def check_db_indexes():
+    """ Create any index declared on the models which an existing DB lacks. """
+    compiler = db.compiler()
+
+    for model in db_models():
+        table = model._meta.db_table
+        try:
+            existing = set(index.name for index in db.get_indexes(table))
+        except (peewee.InternalError, peewee.OperationalError, peewee.ProgrammingError) as e:
+            print("[error] Could not read indexes for %s: %s" % (table, e))
+            continue
+
+        for (fields, unique) in model._index_data():
+            fields = [model._meta.fields[f] if isinstance(f, str) else f for f in fields]
+            index_name = compiler.index_name(table, [f.db_column for f in fields])
+            if index_name in existing:
+                continue
+
+            printdbg("[info]: Creating index %s" % index_name)
+            try:
+                db.create_index(model, fields, unique)
+            except peewee.IntegrityError as e:
+                # duplicate rows already in the table, at least speed up lookups
+                printdbg("[warning]: Can't create unique index %s (%s), creating non-unique index" % (index_name, e))
+                db.create_index(model, fields, False)
+            except (peewee.InternalError, peewee.OperationalError, peewee.ProgrammingError) as e:
+                print("[error] Could not create index %s: %s" % (index_name, e))
+
+
 def check_db_schema_version():
-    """ Ensure DB schema is correct version. Drop tables if not. """
+    """
+    Ensure DB schema is correct version. Migrate it forward if we know how,
+    drop the tables if not. A failed migration is raised, leaving the tables
+    (and our recorded votes) alone.
+    """
+    import migrations
+
     db_schema_version = None
 
     try:
@@ -737,6 +1375,16 @@ def check_db_schema_version():
 
     printdbg("[info]: SCHEMA_VERSION (code) = [%s]" % SCHEMA_VERSION)
     printdbg("[info]: DB_SCHEMA_VERSION = [%s]" % db_schema_version)
+    if (SCHEMA_VERSION != db_schema_version) and migrations.can_migrate(db_schema_version):
+        printdbg("[info]: Schema version mis-match. Migrating tables.")
+        try:
+            migrations.run_migrations(db, db_schema_version, set_schema_version)
+            return
+        except (peewee.InternalError, peewee.OperationalError, peewee.ProgrammingError) as e:
+            # e.g. "database is locked", try again next time
+            print("[error] Could not migrate tables: %s" % e)
+            raise e
+
     if (SCHEMA_VERSION != db_schema_version):
         printdbg("[info]: Schema version mis-match. Syncing tables.")
         try:
@@ -750,8 +1398,13 @@ def check_db_schema_version():
 
 
 def update_schema_version():
-    schema_version_setting, created = Setting.get_or_create(name='DB_SCHEMA_VERSION', defaults={'value': SCHEMA_VERSION})
-    if (schema_version_setting.value != SCHEMA_VERSION):
+    set_schema_version(SCHEMA_VERSION)
+
+
+def set_schema_version(version):
+    schema_version_setting, created = Setting.get_or_create(name='DB_SCHEMA_VERSION', defaults={'value': version})
+    if (schema_version_setting.value != version):
+        schema_version_setting.value = version
         schema_version_setting.save()
     return
 
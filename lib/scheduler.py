@@ -13,9 +13,13 @@ class Scheduler(object):
     transient_key_scheduled = 'NEXT_SENTINEL_CHECK_AT'
     random_interval_max = 1800
 
+    @classmethod
+    def next_run_time(self):
+        return Transient.get(self.transient_key_scheduled) or 0
+
     @classmethod
     def is_run_time(self):
-        next_run_time = Transient.get(self.transient_key_scheduled) or 0
+        next_run_time = self.next_run_time()
         now = misc.now()
 
         printdbg("current_time = %d" % now)
@@ -37,6 +41,8 @@ class Scheduler(object):
         Transient.set(self.transient_key_scheduled, next_run_at,
                       next_run_at)
 
+        return next_run_at
+
     @classmethod
     def delay(self, delay_in_seconds=None):
         if not delay_in_seconds:
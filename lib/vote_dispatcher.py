@@ -0,0 +1,130 @@
+"""
+Queue of votes to cast, submitted to dynamicd in bounded-concurrency waves.
+
+Votes are queued as PendingVote rows, so one that fails or is rate-limited
+by dynamicd stays queued and is retried on a later run after a backoff,
+instead of being recomputed (or forgotten) every run.
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+import config
+import misc
+import dynamiclib
+from models import PendingVote
+from misc import printdbg
+from bitcoinrpc.authproxy import JSONRPCException
+
+
+class VoteDispatcher(object):
+
+    def __init__(self, dynamicd, retry_delay=300, max_retry_delay=21600, max_attempts=5):
+        self.dynamicd = dynamicd
+        # seconds before retrying a failed vote, doubling on each attempt
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+
+    @classmethod
+    def from_config(self, dynamicd):
+        return self(dynamicd,
+                    retry_delay=int(config.sentinel_cfg.get('vote_retry_delay', 300)),
+                    max_attempts=int(config.sentinel_cfg.get('vote_max_attempts', 5)))
+
+    def enqueue(self, govobj, signal, outcome):
+        # already recorded, nothing to send, and an earlier decision still
+        # queued for this signal mustn't overwrite it
+        if govobj.voted_on(signal=signal, outcome=outcome):
+            PendingVote.delete().where((PendingVote.governance_object == govobj) &
+                                       (PendingVote.signal == signal)).execute()
+            return
+
+        (pending, created) = PendingVote.get_or_create(
+            governance_object=govobj, signal=signal,
+            defaults={'outcome': outcome, 'object_hash': govobj.object_hash})
+
+        # we've changed our mind since this was queued, start over
+        if not created and pending._data['outcome'] != outcome.id:
+            pending.outcome = outcome
+            pending.attempts = 0
+            pending.next_attempt_at = 0
+            pending.save()
+
+    def dispatch(self):
+        """
+        Submit every queued vote which is due, at most dynamicd.concurrency at
+        a time. A rate-limited wave halves the concurrency for the rest of
+        this dispatch.
+        """
+        queue = []
+        for pending in PendingVote.due(misc.now()):
+            govobj = pending.governance_object
+            vote_command = govobj.prepare_vote(pending.signal, pending.outcome)
+            if vote_command:
+                queue.append((pending, vote_command))
+            else:
+                # nothing to vote on, or voted that way in the meantime
+                pending.delete_instance()
+
+        if not queue:
+            return
+
+        concurrency = self.dynamicd.concurrency
+        while queue:
+            (wave, queue) = (queue[:concurrency], queue[concurrency:])
+            outputs = self.submit([vote_command for (pending, vote_command) in wave])
+            statuses = [dynamiclib.parse_vote_result(output)[0] for output in outputs]
+
+            # one batch request for the network votes of every failed vote
+            failed = [pending for ((pending, vote_command), status) in zip(wave, statuses)
+                      if status != dynamiclib.VOTE_SUCCESS]
+            self.dynamicd.prefetch_my_gobject_votes([pending.object_hash for pending in failed])
+
+            for ((pending, vote_command), output, status) in zip(wave, outputs, statuses):
+                self.settle(pending, output, status)
+
+            if dynamiclib.VOTE_RATE_LIMITED in statuses and concurrency > 1:
+                concurrency = max(1, concurrency // 2)
+                printdbg("dynamicd is rate-limiting votes, concurrency down to %d" % concurrency)
+
+    def submit(self, vote_commands):
+        # => vote-conf outputs, or the JSONRPCException a command raised
+        concurrent = self.dynamicd.concurrent()
+        if concurrent and len(vote_commands) > 1:
+            return concurrent.run(concurrent.gather_commands(vote_commands))
+
+        outputs = []
+        for vote_command in vote_commands:
+            try:
+                outputs.append(self.dynamicd.rpc_command(*vote_command))
+            except JSONRPCException as e:
+                outputs.append(e)
+        return outputs
+
+    def settle(self, pending, output, status):
+        govobj = pending.governance_object
+
+        if status == dynamiclib.VOTE_SUCCESS:
+            govobj.record_vote(self.dynamicd, pending.signal, pending.outcome, output)
+            pending.delete_instance()
+            return
+
+        # the network may already have our vote, e.g. cast by a previous
+        # install, which is what a rate-limit usually means
+        govobj.sync_network_vote(self.dynamicd, pending.signal)
+        if govobj.voted_on(signal=pending.signal, outcome=pending.outcome):
+            pending.delete_instance()
+            return
+
+        pending.attempts += 1
+        if pending.attempts >= self.max_attempts:
+            print("Giving up voting %s=%s on %s after %d attempts" %
+                  (pending.signal.name, pending.outcome.name, pending.object_hash, pending.attempts))
+            pending.delete_instance()
+            return
+
+        delay = min(self.retry_delay * 2 ** (pending.attempts - 1), self.max_retry_delay)
+        printdbg("vote on %s %s, retrying in %d seconds" % (pending.object_hash, status, delay))
+        pending.next_attempt_at = misc.now() + delay
+        pending.save()
@@ -0,0 +1,109 @@
+"""
+Optional listener for dynamicd's ZMQ notifications (-zmqpubhashblock,
+-zmqpubhashgovernanceobject), used by --daemon mode to react to a new block
+or governance object straight away instead of waiting for the next scheduled
+run.
+
+Requires pyzmq, which isn't in requirements.txt: without it (or without an
+address to connect to) sentinel just runs on the scheduler's timetable.
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+from misc import printdbg
+
+try:
+    import zmq
+except ImportError:
+    zmq = None
+
+DEFAULT_TOPICS = ['hashblock', 'hashgovernanceobject']
+
+
+class ZMQListener(object):
+    """
+    Subscribes to dynamicd's notification topics and collapses bursts of them
+    (a block is usually followed by several governance objects) into a
+    single wake-up.
+    """
+
+    def __init__(self, address, topics=DEFAULT_TOPICS, debounce=2.0, max_delay=10.0):
+        if zmq is None:
+            raise ImportError("ZMQ notifications require pyzmq")
+
+        self.address = address
+        self.topics = topics
+        # wait until nothing's arrived for debounce seconds, but no longer
+        # than max_delay seconds after the first notification
+        self.debounce = debounce
+        self.max_delay = max_delay
+
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        for topic in topics:
+            self.socket.setsockopt(zmq.SUBSCRIBE, topic.encode('utf-8'))
+        self.socket.connect(address)
+
+        self.poller = zmq.Poller()
+        self.poller.register(self.socket, zmq.POLLIN)
+
+    @classmethod
+    def from_config(self, sentinel_cfg, dynamic_conf):
+        """
+        Listener on sentinel.conf's zmq_address, or else the address dynamicd
+        publishes blocks on according to dynamic.conf. None if neither is
+        set or pyzmq isn't installed.
+        """
+        from dynamic_config import DynamicConfig
+
+        address = sentinel_cfg.get('zmq_address') or DynamicConfig.tokenize(dynamic_conf).get('zmqpubhashblock')
+        if not address:
+            return None
+
+        if zmq is None:
+            printdbg("[warning]: zmq_address set but pyzmq isn't installed, ignoring ZMQ notifications")
+            return None
+
+        debounce = float(sentinel_cfg.get('zmq_debounce', 2.0))
+        return self(address, debounce=debounce)
+
+    def _recv(self, timeout):
+        # timeout in seconds => topic, or None if nothing arrived in time
+        if not self.poller.poll(max(0, int(timeout * 1000))):
+            return None
+
+        # [topic, body, sequence number]
+        parts = self.socket.recv_multipart(zmq.NOBLOCK)
+        return parts[0].decode('utf-8')
+
+    def wait(self, timeout):
+        """
+        Block for up to timeout seconds for notifications.
+
+        Returns the set of topics received, empty if there were none.
+        """
+        topic = self._recv(timeout)
+        if topic is None:
+            return set()
+
+        topics = set([topic])
+        first_at = time.time()
+        while True:
+            remaining = self.max_delay - (time.time() - first_at)
+            if remaining <= 0:
+                break
+
+            topic = self._recv(min(self.debounce, remaining))
+            if topic is None:
+                break
+            topics.add(topic)
+
+        printdbg("ZMQ notifications received: %s" % ', '.join(sorted(topics)))
+        return topics
+
+    def close(self):
+        self.socket.close()
+        self.context.term()
@@ -0,0 +1,107 @@
+"""
+Micro-benchmark address validation: the previous base58 codec against the
+current one, and validation with a cold and a warm verdict cache.
+
+Run from the sentinel folder:
+
+    $ ./venv/bin/python test/benchmark/bench_base58.py
+"""
+import os
+import sys
+import time
+import hashlib
+os.environ['SENTINEL_CONFIG'] = os.path.normpath(os.path.join(os.path.dirname(__file__), '../test_sentinel.conf'))
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../../lib')))
+import base58
+import dynamiclib
+
+ADDRESSES = 2000
+REPEAT = 5
+B58CHARS = base58.b58chars
+
+
+# base58.b58decode before the rewrite
+def legacy_b58decode(v):
+    long_value = 0
+    for (i, c) in enumerate(v[::-1]):
+        long_value += B58CHARS.find(c) * (58**i)
+
+    result = bytes()
+    while long_value >= 256:
+        div, mod = divmod(long_value, 256)
+        result = bytes((mod,)) + result
+        long_value = div
+    result = bytes((long_value,)) + result
+
+    nPad = 0
+    for c in v:
+        if c == B58CHARS[0]:
+            nPad += 1
+        else:
+            break
+
+    return bytes((0,)) * nPad + result
+
+
+# base58.b58encode before the rewrite
+def legacy_b58encode(v):
+    long_value = 0
+    for (i, c) in enumerate(v[::-1]):
+        long_value += (256**i) * c
+
+    result = ''
+    while long_value >= 58:
+        div, mod = divmod(long_value, 58)
+        result = B58CHARS[mod] + result
+        long_value = div
+    return B58CHARS[long_value] + result
+
+
+def legacy_is_valid(address):
+    decoded = legacy_b58decode(address)
+    return decoded[-4:] == base58.checksum(decoded[:-4]) and decoded[0] == 76
+
+
+def synthetic_addresses():
+    addresses = []
+    for i in range(ADDRESSES):
+        payload = bytes((76,)) + hashlib.new('sha256', str(i).encode('utf-8')).digest()[:20]
+        addresses.append(base58.b58encode(payload + base58.checksum(payload)))
+    return addresses
+
+
+def timed(func, addresses):
+    start = time.time()
+    for i in range(REPEAT):
+        for address in addresses:
+            func(address)
+    return (time.time() - start) * 1000000 / (REPEAT * len(addresses))
+
+
+def main():
+    addresses = synthetic_addresses()
+    payloads = [base58.b58decode(address) for address in addresses]
+    assert all(legacy_b58decode(address) == payload for (address, payload) in zip(addresses, payloads))
+
+    def validate_cold(address):
+        dynamiclib.address_validity.entries.clear()
+        return dynamiclib.is_valid_dynamic_address(address)
+
+    rows = [
+        ('b58decode, legacy', timed(legacy_b58decode, addresses)),
+        ('b58decode', timed(base58.b58decode, addresses)),
+        ('b58encode, legacy', timed(legacy_b58encode, payloads)),
+        ('b58encode', timed(base58.b58encode, payloads)),
+        ('address validation, legacy', timed(legacy_is_valid, addresses)),
+        ('address validation, uncached', timed(validate_cold, addresses)),
+        ('address validation, cached', timed(dynamiclib.is_valid_dynamic_address, addresses)),
+    ]
+
+    print("%-36s %12s" % ('operation', 'usecs/call'))
+    print('-' * 49)
+    for (name, usecs) in rows:
+        print("%-36s %12.2f" % (name, usecs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark the lookups sentinel runs on every invocation against growing
+tables, with and without the indexes declared on the models.
+
+Uses a throwaway in-memory SQLite DB. Run from the sentinel folder:
+
+    $ ./venv/bin/python test/benchmark/bench_db_indexes.py
+"""
+import os
+import sys
+import time
+os.environ['SENTINEL_ENV'] = 'test'
+os.environ['SENTINEL_CONFIG'] = os.path.normpath(os.path.join(os.path.dirname(__file__), '../test_sentinel.conf'))
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../../lib')))
+import peewee
+from playhouse.test_utils import test_database
+import misc
+from models import GovernanceObject, Setting, Proposal, Superblock, Signal, Outcome, Vote, Watchdog, db_models
+
+SIZES = [1000, 10000, 50000]
+REPEAT = 200
+
+
+def populate(size):
+    now = misc.now()
+    with Signal._meta.database.atomic():
+        Signal.insert_many([{'name': 'funding'}, {'name': 'delete'}]).execute()
+        Outcome.insert_many([{'name': 'yes'}]).execute()
+
+        rows = [{'object_hash': '%064x' % i} for i in range(size)]
+        for chunk in misc.chunks(rows, 400):
+            GovernanceObject.insert_many(chunk).execute()
+
+        rows = [{
+            'governance_object': i + 1,
+            'event_block_height': i,
+            'payment_addresses': '',
+            'payment_amounts': '',
+            'sb_hash': '%064x' % (i // 2),
+            'object_hash': '%064x' % i,
+        } for i in range(size)]
+        for chunk in misc.chunks(rows, 100):
+            Superblock.insert_many(chunk).execute()
+
+        rows = [{'governance_object': i + 1, 'created_at': now - (size - i), 'object_hash': '%064x' % i}
+                for i in range(size)]
+        for chunk in misc.chunks(rows, 300):
+            Watchdog.insert_many(chunk).execute()
+
+        rows = [{'governance_object': i + 1, 'signal': 1 + (i % 2), 'outcome': 1, 'object_hash': '%064x' % i}
+                for i in range(size)]
+        for chunk in misc.chunks(rows, 150):
+            Vote.insert_many(chunk).execute()
+
+        rows = [{'name': '__transient_%d' % i, 'value': '{}'} for i in range(size)]
+        for chunk in misc.chunks(rows, 400):
+            Setting.insert_many(chunk).execute()
+
+
+def drop_indexes(database):
+    # leave the foreign key indexes, which sentinel always had
+    for model in db_models():
+        for (fields, unique) in model._index_data():
+            fields = [model._meta.fields[f] if isinstance(f, str) else f for f in fields]
+            if len(fields) == 1 and isinstance(fields[0], peewee.ForeignKeyField):
+                continue
+            database.drop_index(model, fields)
+
+
+def lookups(size):
+    mid = size // 2
+    now = misc.now()
+    return [
+        ('govobj by object_hash', lambda: GovernanceObject.get(GovernanceObject.object_hash == '%064x' % mid)),
+        ('Superblock.at_height', lambda: list(Superblock.at_height(mid))),
+        ('Superblock.find_highest_deterministic', lambda: Superblock.find_highest_deterministic('%064x' % (mid // 2))),
+        ('Watchdog active', lambda: Watchdog.select().where(Watchdog.created_at >= now - 10).count()),
+        ('Vote by govobj/signal', lambda: Vote.select().where((Vote.governance_object == mid) & (Vote.signal == 1)).count()),
+        ('Setting by name', lambda: Setting.get(Setting.name == '__transient_%d' % mid)),
+    ]
+
+
+def time_lookups(size):
+    timings = []
+    for (name, lookup) in lookups(size):
+        start = time.time()
+        for i in range(REPEAT):
+            lookup()
+        timings.append((name, (time.time() - start) * 1000000 / REPEAT))
+    return timings
+
+
+def main():
+    results = {}
+    for indexed in (False, True):
+        for size in SIZES:
+            database = peewee.SqliteDatabase(':memory:')
+            with test_database(database, db_models()):
+                if not indexed:
+                    drop_indexes(database)
+                populate(size)
+                for (name, usecs) in time_lookups(size):
+                    results[(name, indexed, size)] = usecs
+
+    names = [name for (name, lookup) in lookups(1)]
+    header = "%-40s %-9s" % ('lookup (usecs/query)', 'indexes') + ''.join('%12d' % size for size in SIZES)
+    print(header)
+    print('-' * len(header))
+    for name in names:
+        for indexed in (False, True):
+            row = [results[(name, indexed, size)] for size in SIZES]
+            print("%-40s %-9s" % (name, 'yes' if indexed else 'no') + ''.join('%12.1f' % usecs for usecs in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark dynode elections on large synthetic dynode lists: the previous
+sort-everything implementation against the streaming DynodeElection, with a
+cold and a warm vin hash cache.
+
+Run from the sentinel folder:
+
+    $ ./venv/bin/python test/benchmark/bench_dn_election.py
+"""
+import os
+import sys
+import time
+os.environ['SENTINEL_CONFIG'] = os.path.normpath(os.path.join(os.path.dirname(__file__), '../test_sentinel.conf'))
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../../lib')))
+from dynamiclib import DynodeElection
+from dynode import DynodeList
+
+SIZES = [10000, 100000]
+BLOCK_HASH = '000001c9ba1df5a1c58a4e458fb6febfe9329b1947802cd60a4ae90dd754b534'
+
+
+def legacy_hashit(data):
+    import hashlib
+    return int(hashlib.sha256(data.encode('utf-8')).hexdigest(), 16)
+
+
+# dynamiclib.elect_dn before the streaming election
+def legacy_elect_dn(block_hash, dn_list):
+    enabled = [dn for dn in dn_list if dn.status == 'ENABLED']
+    block_hash_hash = legacy_hashit(block_hash)
+
+    candidates = []
+    for dn in enabled:
+        diff = legacy_hashit(dn.vin) - block_hash_hash
+        candidates.append({'vin': dn.vin, 'diff': abs(diff)})
+    candidates.sort(key=lambda k: k['diff'])
+
+    try:
+        return candidates[0]['vin']
+    except:
+        return None
+
+
+def synthetic_dynodes(size):
+    dnlist = {}
+    for i in range(size):
+        status = 'ENABLED' if i % 10 else 'EXPIRED'
+        dnlist['%064x-%d' % (i * 7919, i % 3)] = '  %s 70201 yUuAsYCnG5XrjgsGvRwcDqPhgLUnzNfe8L 1474157732 1590425 1474155175 71122 10.0.%d.%d:33300' % (status, i // 256 % 256, i % 256)
+    return DynodeList.from_dynodelist(dnlist)
+
+
+def timed(func):
+    start = time.time()
+    result = func()
+    return (result, (time.time() - start) * 1000)
+
+
+def main():
+    print("%-36s" % 'election (msecs)' + ''.join('%12d' % size for size in SIZES))
+    print('-' * (36 + 12 * len(SIZES)))
+
+    rows = {}
+    for size in SIZES:
+        dynodes = synthetic_dynodes(size)
+        vins = dynodes.vins_with_status('ENABLED')
+        election = DynodeElection()
+
+        (legacy, rows[('legacy (sort all)', size)]) = timed(lambda: legacy_elect_dn(BLOCK_HASH, dynodes))
+        (cold, rows[('streaming, cold vin hashes', size)]) = timed(lambda: election.winner(BLOCK_HASH, vins))
+        (warm, rows[('streaming, cached vin hashes', size)]) = timed(lambda: election.winner(BLOCK_HASH, vins))
+        (ranking, rows[('top-10 ranking, cached', size)]) = timed(lambda: election.rank(BLOCK_HASH, vins))
+        assert legacy == cold == warm == ranking[0][0]
+
+    for name in ['legacy (sort all)', 'streaming, cold vin hashes', 'streaming, cached vin hashes', 'top-10 ranking, cached']:
+        print("%-36s" % name + ''.join('%12.1f' % rows[(name, size)] for size in SIZES))
+
+
+if __name__ == '__main__':
+    main()
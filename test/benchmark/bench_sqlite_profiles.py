@@ -0,0 +1,118 @@
+"""
+Benchmark a full gobject sync, followed by a vote-count-only resync and a
+run of small autocommitted writes (transients, votes), under each of the
+SQLite profiles in config.SQLITE_PROFILES.
+
+Each profile runs in its own process against a fresh on-disk DB in a temp
+folder, since the pragmas are applied when models opens its connection. Run
+from the sentinel folder:
+
+    $ ./venv/bin/python test/benchmark/bench_sqlite_profiles.py
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import simplejson
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../../lib')))
+
+SIZE = 2000
+SMALL_WRITES = 300
+
+
+class GobjectListDynamicd(object):
+    def __init__(self, items):
+        self.golist = dict((item['Hash'], item) for item in items)
+
+    def rpc_command(self, *params):
+        return self.golist
+
+
+def gobject_list(size):
+    import dynamiclib
+    items = []
+    for i in range(size):
+        data_hex = dynamiclib.encode_dynamicd_gobject('proposal', {
+            'name': 'proposal-%d' % i,
+            'url': 'https://duality.solutions/proposal-%d' % i,
+            'payment_address': 'yYe8KwyaUu5YswSYmB3q3ryx8XTUu9y7Ui',
+            'payment_amount': 25.75,
+            'start_epoch': 1474261086,
+            'end_epoch': 2122520400,
+        })
+        items.append({
+            'Hash': '%064x' % i,
+            'CollateralHash': '%064x' % (i + size),
+            'DataHex': data_hex,
+            'AbsoluteYesCount': 10, 'YesCount': 10, 'NoCount': 0, 'AbstainCount': 0,
+            'fBlockchainValidity': True, 'IsValidReason': '', 'fCachedValid': True,
+            'fCachedFunding': False, 'fCachedDelete': False, 'fCachedEndorsed': False,
+        })
+    return items
+
+
+def run_profile():
+    from models import GovernanceObject, Transient, Vote, Signal, Outcome, db
+    dynamicd = GobjectListDynamicd(gobject_list(SIZE))
+    timings = {}
+
+    start = time.time()
+    GovernanceObject.sync(dynamicd)
+    timings['full sync'] = time.time() - start
+
+    for item in list(dynamicd.golist.values())[::5]:
+        item['YesCount'] += 1
+    start = time.time()
+    GovernanceObject.sync(dynamicd)
+    timings['vote count resync'] = time.time() - start
+
+    start = time.time()
+    for i in range(SMALL_WRITES):
+        Transient.set('bench_%d' % i, i, 60)
+        Transient.delete('bench_%d' % i)
+    timings['transient set/delete'] = time.time() - start
+
+    funding = Signal.get(Signal.name == 'funding')
+    yes = Outcome.get(Outcome.name == 'yes')
+    start = time.time()
+    for govobj in GovernanceObject.select().limit(SMALL_WRITES):
+        Vote.create(governance_object=govobj, signal=funding, outcome=yes, object_hash=govobj.object_hash)
+    timings['vote inserts'] = time.time() - start
+
+    timings['journal_mode'] = db.execute_sql('PRAGMA journal_mode').fetchone()[0]
+    print(simplejson.dumps(timings))
+
+
+def main():
+    import config
+    results = []
+    for profile in sorted(config.SQLITE_PROFILES):
+        tmpdir = tempfile.mkdtemp(prefix='sentinel_bench_')
+        try:
+            conf = os.path.join(tmpdir, 'sentinel.conf')
+            with open(conf, 'w') as f:
+                f.write("network=testnet\ndb_driver=sqlite\ndb_name=%s\nsqlite_profile=%s\n"
+                        % (os.path.join(tmpdir, 'sentinel.db'), profile))
+
+            env = dict(os.environ, SENTINEL_CONFIG=conf, SENTINEL_ENV='production')
+            output = subprocess.check_output([sys.executable, __file__, '--profile'], env=env)
+            results.append((profile, simplejson.loads(output.decode('utf-8').strip().splitlines()[-1])))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    phases = ['full sync', 'vote count resync', 'transient set/delete', 'vote inserts']
+    header = "%-12s %-8s" % ('profile', 'journal') + ''.join('%22s' % phase for phase in phases)
+    print("%d gobjects, %d small writes (seconds)" % (SIZE, SMALL_WRITES))
+    print(header)
+    print('-' * len(header))
+    for (profile, timings) in results:
+        print("%-12s %-8s" % (profile, timings['journal_mode']) + ''.join('%22.3f' % timings[phase] for phase in phases))
+
+
+if __name__ == '__main__':
+    if '--profile' in sys.argv:
+        run_profile()
+    else:
+        main()
@@ -230,3 +230,141 @@ def test_approved_and_ranked(go_list_proposals):
 
 #    assert prop_list[0].object_hash == u'dfd7d63979c0b62456b63d5fc5306dbec451180adee85876cbf5b28c69d1a86c'
 #    assert prop_list[1].object_hash == u'0523445762025b2e01a2cd34f1d10f4816cf26ee1796167e5b029901e5873630'
+
+
+# stands in for dynamicd, only knows about "gobject list"
+class GobjectListDynamicd(object):
+    def __init__(self, items):
+        self.golist = {item['Hash']: item for item in items}
+
+    def rpc_command(self, *params):
+        assert list(params) == ['gobject', 'list']
+        return self.golist
+
+
+def test_sync_skips_unchanged_objects(go_list_proposals):
+    dynamicd = GobjectListDynamicd(go_list_proposals)
+    object_hash = go_list_proposals[0]['Hash']
+
+    GovernanceObject.sync(dynamicd)
+    assert Proposal.select().count() == 2
+
+    # unchanged fingerprint, so the subobject isn't re-imported
+    Proposal.update(name='tampered').where(Proposal.object_hash == object_hash).execute()
+    GovernanceObject.sync(dynamicd)
+    assert Proposal.get(Proposal.object_hash == object_hash).name == 'tampered'
+
+    # only vote counts moved, just those are updated
+    dynamicd.golist[object_hash]['YesCount'] = 2000
+    GovernanceObject.sync(dynamicd)
+    assert GovernanceObject.get(GovernanceObject.object_hash == object_hash).yes_count == 2000
+    assert Proposal.get(Proposal.object_hash == object_hash).name == 'tampered'
+
+    # a changed fingerprint triggers a full re-import
+    GovernanceObject.update(object_fingerprint='').execute()
+    GovernanceObject.sync(dynamicd)
+    assert Proposal.get(Proposal.object_hash == object_hash).name == 'dean-miller-5493'
+
+
+# also votes, failing until told otherwise
+class VotingGobjectListDynamicd(GobjectListDynamicd):
+    concurrency = 1
+
+    def __init__(self, items):
+        GobjectListDynamicd.__init__(self, items)
+        self.vote_result = 'failed'
+        self.votes = []
+
+    def rpc_command(self, *params):
+        if list(params[:2]) == ['gobject', 'vote-conf']:
+            self.votes.append(params[2])
+            return {'overall': '', 'detail': {'dynamic.conf': {'result': self.vote_result}}}
+        return GobjectListDynamicd.rpc_command(self, *params)
+
+    def concurrent(self):
+        return None
+
+    def prefetch_my_gobject_votes(self, object_hashes):
+        pass
+
+    def get_my_gobject_votes(self, object_hash):
+        return []
+
+
+def test_sync_revisits_invalid_objects_until_voted(go_list_proposals):
+    import dynamiclib
+    from models import PendingVote, VoteSignals, VoteOutcomes
+    PendingVote.delete().execute()
+
+    # a proposal without a start_epoch can't be stored
+    invalid = dict(go_list_proposals[0])
+    invalid['Hash'] = '%064x' % 1
+    invalid['DataHex'] = dynamiclib.serialise([["proposal", {
+        "end_epoch": 2122520400,
+        "name": "no-start-epoch",
+        "payment_address": "yYe8KwyaUu5YswSYmB3q3ryx8XTUu9y7Ui",
+        "payment_amount": 25.75,
+        "type": 1,
+        "url": "http://duality.solutions/no-start-epoch",
+    }]])
+    dynamicd = VotingGobjectListDynamicd(go_list_proposals + [invalid])
+
+    GovernanceObject.sync(dynamicd)
+    assert dynamicd.votes == [invalid['Hash']]
+
+    # unchanged, but our delete vote is outstanding, so it isn't skipped
+    PendingVote.update(next_attempt_at=0).execute()
+    dynamicd.vote_result = 'success'
+    GovernanceObject.sync(dynamicd)
+    assert dynamicd.votes == [invalid['Hash']] * 2
+    govobj = GovernanceObject.get(GovernanceObject.object_hash == invalid['Hash'])
+    assert govobj.voted_on(signal=VoteSignals.delete, outcome=VoteOutcomes.yes)
+    assert PendingVote.select().count() == 0
+
+    # once voted, it's skipped like any other unchanged object
+    GovernanceObject.sync(dynamicd)
+    assert GovernanceObject.get(GovernanceObject.id == govobj.id).object_fingerprint == dynamiclib.gobject_fingerprint(invalid)
+    assert dynamicd.votes == [invalid['Hash']] * 2
+
+
+def test_validated_as_stored(go_list_proposals):
+    import dynamiclib
+    from models import decode_and_validate_gobject
+
+    # epochs as strings, which the DB stores as integers
+    rec = dict(go_list_proposals[0])
+    rec['DataHex'] = dynamiclib.serialise([["proposal", {
+        "end_epoch": "2122520400",
+        "name": "string-epochs",
+        "payment_address": "yYe8KwyaUu5YswSYmB3q3ryx8XTUu9y7Ui",
+        "payment_amount": "25.75",
+        "start_epoch": "1474261086",
+        "type": 1,
+        "url": "http://duality.solutions/string-epochs",
+    }]])
+
+    (gobj_dict, subclass, subdikt, valid) = decode_and_validate_gobject(rec)
+    GovernanceObject.import_gobjects_from_dynamicd([rec])
+    assert valid is True
+    assert Proposal.get(Proposal.object_hash == rec['Hash']).is_valid() is valid
+
+
+def test_parallel_decode_matches_serial(go_list_proposals):
+    from governance_class import GovernanceClass
+
+    serial = GovernanceObject.parse_gobjects_from_dynamicd(go_list_proposals)
+
+    config.sentinel_cfg['sync_workers'] = '2'
+    config.sentinel_cfg['sync_chunk_size'] = '1'
+    try:
+        parallel = GovernanceObject.parse_gobjects_from_dynamicd(go_list_proposals)
+    finally:
+        del config.sentinel_cfg['sync_workers']
+        del config.sentinel_cfg['sync_chunk_size']
+
+    assert parallel == serial
+    assert [subclass for (gobj_dict, subclass, subdikt) in parallel] == [Proposal, Proposal]
+
+    # validity verdicts were fed back from the workers
+    for item in go_list_proposals:
+        assert GovernanceClass.validity[item['Hash']] is True
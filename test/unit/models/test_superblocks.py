@@ -241,3 +241,162 @@ def test_deterministic_superblock_selection(go_list_superblocks):
     sb = Superblock.find_highest_deterministic('22a5f429c5ffb2b79b1b30c3ac30751284e3efa4e710bc7fd35fbe7456b1e485')
 
 #    assert sb.object_hash == 'bc2834f357da7504138566727c838e6ada74d079e63b6104701f4f8eb05dae36'
+
+
+def test_bulk_import(go_list_proposals, go_list_superblocks):
+    import dynamiclib
+
+    # a proposal without a start_epoch can't be stored
+    invalid = dict(go_list_proposals[0])
+    invalid['Hash'] = '%064x' % 1
+    invalid['DataHex'] = dynamiclib.serialise([["proposal", {
+        "end_epoch": 2122520400,
+        "name": "no-start-epoch",
+        "payment_address": "yYe8KwyaUu5YswSYmB3q3ryx8XTUu9y7Ui",
+        "payment_amount": 25.75,
+        "type": 1,
+        "url": "http://duality.solutions/no-start-epoch",
+    }]])
+
+    records = go_list_proposals + go_list_superblocks + [invalid]
+    rejected = GovernanceObject.import_gobjects_from_dynamicd(records)
+
+    assert [go.object_hash for go in rejected] == [invalid['Hash']]
+    assert GovernanceObject.select().count() == 6
+    assert Proposal.select().count() == 2
+    assert Superblock.select().count() == 3
+
+    # pre_save hook ran for the bulk inserted superblocks
+    for sb in Superblock.select():
+        assert sb.sb_hash == sb.hex_hash()
+        assert sb.governance_object.object_hash == sb.object_hash
+
+    # re-importing updates in place, keeping the govobj ids (and their votes)
+    go_ids = sorted(go.id for go in GovernanceObject.select())
+    GovernanceObject.import_gobjects_from_dynamicd(records)
+    assert sorted(go.id for go in GovernanceObject.select()) == go_ids
+    assert Superblock.select().count() == 3
+
+
+def test_bulk_import_rejected_govobj(go_list_proposals, go_list_superblocks):
+    # a govobj row which can't be stored (NOT NULL vote count)
+    broken = dict(go_list_superblocks[0])
+    broken['YesCount'] = None
+
+    records = go_list_proposals + [broken] + go_list_superblocks[1:]
+    assert GovernanceObject.import_gobjects_from_dynamicd(records) == []
+
+    # everything else is stored, the rejected govobj's superblock is skipped
+    assert GovernanceObject.select().where(GovernanceObject.object_hash == broken['Hash']).count() == 0
+    assert GovernanceObject.select().count() == 4
+    assert Proposal.select().count() == 2
+    assert Superblock.select().count() == 2
+
+
+def test_purge_network_removed(go_list_proposals, go_list_superblocks):
+    from models import VoteSignals, VoteOutcomes
+
+    GovernanceObject.import_gobjects_from_dynamicd(go_list_proposals + go_list_superblocks)
+    removed = GovernanceObject.get(GovernanceObject.object_hash == go_list_superblocks[0]['Hash'])
+    Vote(governance_object=removed, signal=VoteSignals.funding, outcome=VoteOutcomes.yes,
+         object_hash=removed.object_hash).save()
+
+    live = [item['Hash'] for item in go_list_proposals + go_list_superblocks[1:]]
+    assert GovernanceObject.purge_network_removed(live) >= 1
+
+    assert sorted(go.object_hash for go in GovernanceObject.select()) == sorted(live)
+    assert Superblock.select().where(Superblock.object_hash == removed.object_hash).count() == 0
+    assert Vote.select().where(Vote.object_hash == removed.object_hash).count() == 0
+    assert Proposal.select().count() == 2
+
+
+def test_vote_index(go_list_superblocks):
+    from models import VoteSignals, VoteOutcomes, vote_index
+
+    GovernanceObject.import_gobjects_from_dynamicd(go_list_superblocks)
+    go = GovernanceObject.get(GovernanceObject.object_hash == go_list_superblocks[0]['Hash'])
+    Vote.delete().where(Vote.governance_object == go).execute()
+
+    vote_index.load()
+    try:
+        assert not go.voted_on(signal=VoteSignals.funding)
+
+        # saves and deletes keep the index current
+        vote = Vote(governance_object=go, signal=VoteSignals.funding,
+                    outcome=VoteOutcomes.yes, object_hash=go.object_hash)
+        vote.save()
+        assert go.voted_on(signal=VoteSignals.funding)
+        assert go.voted_on(signal=VoteSignals.funding, outcome=VoteOutcomes.yes)
+        assert not go.voted_on(signal=VoteSignals.funding, outcome=VoteOutcomes.no)
+        assert not go.voted_on(signal=VoteSignals.delete)
+
+        vote.delete_instance()
+        assert not go.voted_on(signal=VoteSignals.funding)
+    finally:
+        vote_index.unload()
+
+
+def test_check_db_indexes():
+    from models import check_db_indexes
+
+    index_name = 'superblocks_sb_hash'
+    config.db.drop_index(Superblock, [Superblock.sb_hash])
+    assert index_name not in [i.name for i in config.db.get_indexes('superblocks')]
+
+    # an existing DB without the index gets it back without losing any data
+    count = Superblock.select().count()
+    check_db_indexes()
+    assert index_name in [i.name for i in config.db.get_indexes('superblocks')]
+    assert Superblock.select().count() == count
+
+
+def test_schema_migration():
+    from playhouse.migrate import SchemaMigrator, migrate
+    from models import VoteSignals, VoteOutcomes, Setting, check_db_sane, SCHEMA_VERSION
+    import migrations
+
+    assert migrations.MIGRATIONS[-1][0] == SCHEMA_VERSION
+
+    go = GovernanceObject.create(object_hash='%064x' % 2)
+    Vote(governance_object=go, signal=VoteSignals.funding, outcome=VoteOutcomes.yes,
+         object_hash=go.object_hash).save()
+
+    # roll the DB back to the original schema
+    migrate(SchemaMigrator.from_database(config.db).drop_column('governance_objects', 'object_fingerprint'))
+    Setting.update(value=migrations.BASE_SCHEMA_VERSION).where(Setting.name == 'DB_SCHEMA_VERSION').execute()
+
+    check_db_sane()
+
+    # upgraded in place, votes kept
+    assert 'object_fingerprint' in [c.name for c in config.db.get_columns('governance_objects')]
+    assert Setting.get(Setting.name == 'DB_SCHEMA_VERSION').value == SCHEMA_VERSION
+    assert Vote.select().where(Vote.object_hash == go.object_hash).count() == 1
+    assert GovernanceObject.get(GovernanceObject.object_hash == go.object_hash).object_fingerprint is None
+
+
+def test_failed_migration_keeps_tables(monkeypatch):
+    import peewee
+    from playhouse.migrate import SchemaMigrator, migrate
+    from models import VoteSignals, VoteOutcomes, Setting, check_db_sane, SCHEMA_VERSION
+    import migrations
+
+    go = GovernanceObject.create(object_hash='%064x' % 3)
+    Vote(governance_object=go, signal=VoteSignals.funding, outcome=VoteOutcomes.yes,
+         object_hash=go.object_hash).save()
+
+    # roll the DB back to the original schema
+    migrate(SchemaMigrator.from_database(config.db).drop_column('governance_objects', 'object_fingerprint'))
+    Setting.update(value=migrations.BASE_SCHEMA_VERSION).where(Setting.name == 'DB_SCHEMA_VERSION').execute()
+
+    def run_migrations(db, db_schema_version, on_migrated):
+        raise peewee.OperationalError('database is locked')
+    monkeypatch.setattr(migrations, 'run_migrations', run_migrations)
+
+    with pytest.raises(peewee.OperationalError):
+        check_db_sane()
+    assert Vote.select().where(Vote.object_hash == go.object_hash).count() == 1
+
+    monkeypatch.undo()
+    check_db_sane()
+    assert Setting.get(Setting.name == 'DB_SCHEMA_VERSION').value == SCHEMA_VERSION
+    assert Vote.select().where(Vote.object_hash == go.object_hash).count() == 1
@@ -66,3 +66,99 @@ def test_get_rpc_creds():
 # requires running dynamicd on whatever port specified...
 #
 # This is more of a dynamicd/jsonrpc test than a config test...
+
+
+def test_sqlite_pragmas(monkeypatch):
+    # SQLite's own defaults unless another profile is asked for
+    monkeypatch.setattr(config, 'sentinel_cfg', {})
+    assert config.get_sqlite_pragmas() == []
+    monkeypatch.setattr(config, 'sentinel_cfg', {'sqlite_profile': 'bogus'})
+    assert config.get_sqlite_pragmas() == []
+
+    monkeypatch.setattr(config, 'sentinel_cfg', {'sqlite_profile': 'performance'})
+    pragmas = config.get_sqlite_pragmas()
+    assert pragmas[0] == ('journal_mode', 'wal')
+    assert ('synchronous', 'normal') in pragmas
+
+    monkeypatch.setattr(config, 'sentinel_cfg', {'sqlite_profile': 'legacy', 'sqlite_busy_timeout': '2000'})
+    assert config.get_sqlite_pragmas() == [('busy_timeout', '2000')]
+
+    monkeypatch.setattr(config, 'sentinel_cfg', {'sqlite_profile': 'safe', 'sqlite_synchronous': 'extra'})
+    assert config.get_sqlite_pragmas() == [('journal_mode', 'wal'), ('synchronous', 'extra'), ('busy_timeout', 5000)]
+
+
+def test_pooled_db_conn(monkeypatch):
+    import peewee
+    from db_pool import PooledPostgres
+    from playhouse.pool import PooledMySQLDatabase
+
+    monkeypatch.setattr(config, 'sentinel_cfg', {'db_driver': 'mysql'})
+    assert type(config.get_db_conn()) == peewee.MySQLDatabase
+
+    monkeypatch.setattr(config, 'sentinel_cfg', {'db_driver': 'mysql', 'db_pool_size': '4'})
+    db = config.get_db_conn()
+    assert isinstance(db, PooledMySQLDatabase)
+    assert db.max_connections == 4
+    assert db.stale_timeout == 300
+
+    monkeypatch.setattr(config, 'sentinel_cfg', {'db_driver': 'postgres', 'db_pool_size': '2', 'db_pool_stale_timeout': '60'})
+    db = config.get_db_conn()
+    assert isinstance(db, PooledPostgres)
+    assert db.stale_timeout == 60
+
+    # sqlite has nothing to pool
+    monkeypatch.setattr(config, 'sentinel_cfg', {'db_driver': 'sqlite', 'db_pool_size': '4'})
+    assert type(config.get_db_conn()) == peewee.SqliteDatabase
+
+
+def test_release_connection(tmpdir):
+    import peewee
+    from playhouse.pool import PooledSqliteDatabase
+    from db_pool import release_connection
+
+    db = PooledSqliteDatabase(str(tmpdir.join('pool.db')), max_connections=2)
+    db.execute_sql('SELECT 1')
+    release_connection(db)
+    assert db.is_closed()
+    assert len(db._in_use) == 0 and len(db._connections) == 1
+
+    # the next run checks it out again
+    db.execute_sql('SELECT 1')
+    assert len(db._in_use) == 1 and len(db._connections) == 0
+
+    # nothing to hand back without a pool
+    db = peewee.SqliteDatabase(str(tmpdir.join('plain.db')))
+    db.execute_sql('SELECT 1')
+    release_connection(db)
+    assert not db.is_closed()
+
+
+def test_pooled_postgres_health_check():
+    from db_pool import PooledPostgres
+
+    class FakeCursor(object):
+        def __init__(self, conn):
+            self.conn = conn
+
+        def execute(self, sql):
+            if self.conn.dropped:
+                raise Exception('server closed the connection unexpectedly')
+
+        def close(self):
+            pass
+
+    class FakeConn(object):
+        closed = 0
+
+        def __init__(self, dropped):
+            self.dropped = dropped
+
+        def cursor(self):
+            return FakeCursor(self)
+
+        def rollback(self):
+            pass
+
+    db = PooledPostgres('sentinel', max_connections=2)
+    assert db._is_closed(1, FakeConn(dropped=False)) is False
+    assert db._is_closed(2, FakeConn(dropped=True)) is True
@@ -0,0 +1,358 @@
+import pytest
+import sys
+import os
+import threading
+import time
+import simplejson
+os.environ['SENTINEL_ENV'] = 'test'
+os.environ['SENTINEL_CONFIG'] = os.path.normpath(os.path.join(os.path.dirname(__file__), '../test_sentinel.conf'))
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../../lib')))
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+from bitcoinrpc.authproxy import JSONRPCException
+
+
+# minimal keep-alive JSONRPC server standing in for dynamicd
+class FakeDynamicdHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        server.requests += 1
+
+        length = int(self.headers.get('Content-Length'))
+        payload = simplejson.loads(self.rfile.read(length), use_decimal=True)
+        body = simplejson.dumps(server.dispatch(payload), use_decimal=True).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        if server.drop_after_response:
+            server.drop_after_response = False
+            self.close_connection = True
+
+
+class FakeDynamicd(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, methods):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), FakeDynamicdHandler)
+        self.methods = methods
+        self.connections = set()
+        self.requests = 0
+        self.drop_after_response = False
+
+    def dispatch(self, request):
+        if isinstance(request, list):
+            # answer batches in reverse, clients must match on id
+            return [self.dispatch(r) for r in reversed(request)]
+
+        method = self.methods.get(request['method'])
+        if method is None:
+            return {'result': None, 'id': request['id'],
+                    'error': {'code': -32601, 'message': 'Method not found'}}
+        try:
+            result = method(*request['params'])
+        except Exception as e:
+            return {'result': None, 'id': request['id'],
+                    'error': {'code': -1, 'message': str(e)}}
+        return {'result': result, 'error': None, 'id': request['id']}
+
+
+@pytest.fixture
+def fake_dynamicd(request):
+    height = {'blocks': 100}
+
+    def getblockcount():
+        height['blocks'] += 1
+        return height['blocks']
+
+    server = FakeDynamicd({
+        'getblockcount': getblockcount,
+        'getblockhash': lambda h: '%064x' % h,
+        'getsuperblockbudget': lambda h: '%d.5' % h,
+        'getgovernanceinfo': lambda: {'superblockcycle': 24, 'governanceminquorum': 1},
+        'dynode': lambda *args: 42,
+        'sleep': lambda seconds: time.sleep(seconds) or seconds,
+    })
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    def fin():
+        server.shutdown()
+        server.server_close()
+    request.addfinalizer(fin)
+
+    return server
+
+
+@pytest.fixture
+def dynamicd(fake_dynamicd):
+    from dynamicd import DynamicDaemon
+    (host, port) = fake_dynamicd.server_address
+    return DynamicDaemon(host=host, port=port, user='dynamicrpc', password='secret')
+
+
+# ========================================================================
+
+
+def test_rpc_connection_is_reused(fake_dynamicd, dynamicd):
+    assert dynamicd.rpc_command('getblockcount') == 101
+    assert dynamicd.rpc_command('getblockcount') == 102
+    assert dynamicd.rpc_command('getblockhash', 5) == '%064x' % 5
+
+    # every call went over the same socket
+    assert fake_dynamicd.requests == 3
+    assert len(fake_dynamicd.connections) == 1
+
+    stats = dynamicd.rpc_connection.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 2
+    assert stats['reconnects'] == 0
+
+
+def test_rpc_reconnects_on_dropped_connection(fake_dynamicd, dynamicd):
+    fake_dynamicd.drop_after_response = True
+    assert dynamicd.rpc_command('getblockcount') == 101
+
+    # pooled socket was closed by the server, next call must transparently
+    # reconnect and succeed
+    assert dynamicd.rpc_command('getblockcount') == 102
+    assert len(fake_dynamicd.connections) == 2
+    assert dynamicd.rpc_connection.stats()['reconnects'] == 1
+
+
+def test_rpc_error_keeps_connection(fake_dynamicd, dynamicd):
+    with pytest.raises(JSONRPCException):
+        dynamicd.rpc_command('nosuchmethod')
+
+    assert dynamicd.rpc_command('getblockcount') == 101
+    assert len(fake_dynamicd.connections) == 1
+
+
+def test_rpc_batch(fake_dynamicd, dynamicd):
+    results = dynamicd.rpc_batch([
+        ['getblockhash', 1],
+        ['nosuchmethod'],
+        ['getblockhash', 2],
+    ])
+
+    assert fake_dynamicd.requests == 1
+    assert results[0] == '%064x' % 1
+    assert isinstance(results[1], JSONRPCException)
+    assert results[1].message == 'Method not found'
+    assert results[2] == '%064x' % 2
+
+    assert dynamicd.rpc_batch([]) == []
+
+
+def test_superblock_budget_allocations(fake_dynamicd, dynamicd):
+    from decimal import Decimal
+    allocations = dynamicd.get_superblock_budget_allocations([10, 20])
+
+    assert allocations == [Decimal('10.5'), Decimal('20.5')]
+    assert fake_dynamicd.requests == 1
+
+
+def test_chain_state_snapshot(fake_dynamicd, dynamicd):
+    state = dynamicd.refresh_chain_state()
+    assert state.height == 101
+    assert state.block_hash == '%064x' % 101
+    assert state.enabled_dynodes == 42
+    requests = fake_dynamicd.requests
+
+    # helpers are answered from the snapshot, even though the fake daemon's
+    # tip would have moved on
+    assert dynamicd.block_height() == 101
+    assert dynamicd.current_block_hash() == '%064x' % 101
+    assert dynamicd.last_superblock_height() == 96
+    assert dynamicd.next_superblock_height() == 120
+    assert dynamicd.governance_quorum() == 4
+    assert dynamicd.is_govobj_maturity_phase() is True
+    assert dynamicd.block_height_to_epoch(200) > 0
+    assert fake_dynamicd.requests == requests
+
+    # until explicitly refreshed
+    assert dynamicd.refresh_chain_state().height == 102
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason="asyncio front-end needs Python 3.5+")
+def test_concurrent_commands_overlap(fake_dynamicd):
+    from decimal import Decimal
+    from dynamicd import DynamicDaemon
+    (host, port) = fake_dynamicd.server_address
+
+    dynamicd = DynamicDaemon(host=host, port=port, user='dynamicrpc', password='secret')
+    assert dynamicd.concurrent() is None
+
+    dynamicd = DynamicDaemon(host=host, port=port, user='dynamicrpc', password='secret', concurrency=4)
+    concurrent = dynamicd.concurrent()
+    assert concurrent is dynamicd.concurrent()
+
+    start = time.time()
+    results = concurrent.run(concurrent.gather_commands([
+        ['sleep', 0.3],
+        ['nosuchmethod'],
+        ['sleep', 0.3],
+        ['sleep', 0.3],
+    ]))
+    elapsed = time.time() - start
+
+    # bounded by the slowest call, not the sum
+    assert elapsed < 0.8
+    assert results[0] == results[2] == results[3] == Decimal('0.3')
+    assert isinstance(results[1], JSONRPCException)
+
+    # any other DynamicDaemon method, as a coroutine
+    assert concurrent.run(concurrent.block_height()) == 101
+    dynamicd.close()
+
+
+def test_rpc_cache():
+    from dynamicd import RPCCache, NOT_FETCHED
+    from models import Setting, Transient
+    Setting.delete().where(Setting.name.startswith('__transient_RPC_CACHE_')).execute()
+    cache = RPCCache(store=Transient)
+
+    cache.set('dynode count', 'dynode count enabled', 42, height=100)
+    assert cache.get('dynode count', 'dynode count enabled', 100) == 42
+    assert cache.get('dynode count', 'dynode count enabled') == 42
+    # a new block invalidates height bound answers...
+    assert cache.get('dynode count', 'dynode count enabled', 101) is NOT_FETCHED
+
+    # ...but not the budget at a given height
+    cache.set('getsuperblockbudget', 'getsuperblockbudget 240', '1.5', height=100)
+    assert cache.get('getsuperblockbudget', 'getsuperblockbudget 240', 101) == '1.5'
+
+    # persisted in the store, e.g. for the next run
+    cache = RPCCache(store=Transient)
+    assert cache.get('dynode count', 'dynode count enabled', 100) == 42
+    assert cache.get('getsuperblockbudget', 'getsuperblockbudget 240') == '1.5'
+    cache.set('dynode count', 'dynode count enabled', 43, height=101)
+    assert RPCCache(store=Transient).get('dynode count', 'dynode count enabled', 101) == 43
+
+    # TTL
+    cache.entries['dynode count enabled']['expires_at'] = time.time() - 1
+    assert cache.get('dynode count', 'dynode count enabled', 100) is NOT_FETCHED
+
+
+def test_cached_rpcs(fake_dynamicd):
+    from decimal import Decimal
+    from dynamicd import DynamicDaemon
+    from models import Setting, Transient
+    (host, port) = fake_dynamicd.server_address
+    Setting.delete().where(Setting.name.startswith('__transient_RPC_CACHE_')).execute()
+    store = Transient
+
+    dynamicd = DynamicDaemon(host=host, port=port, user='dynamicrpc', password='secret', rpc_cache_store=store)
+    assert dynamicd.get_superblock_budget_allocations([10, 20]) == [Decimal('10.5'), Decimal('20.5')]
+    assert dynamicd.governance_quorum() == 4
+    assert fake_dynamicd.requests == 3
+
+    # a later run within the same block only asks what it doesn't know
+    dynamicd = DynamicDaemon(host=host, port=port, user='dynamicrpc', password='secret', rpc_cache_store=store)
+    assert dynamicd.get_superblock_budget_allocations([10, 20, 30]) == [Decimal('10.5'), Decimal('20.5'), Decimal('30.5')]
+    assert dynamicd.get_superblock_budget_allocation(20) == Decimal('20.5')
+    assert dynamicd.governance_quorum() == 4
+    assert fake_dynamicd.requests == 4
+
+
+# stands in for models.BlockTime
+class BlockTimes(dict):
+    def lookup(self, height, block_hash=None):
+        entry = self.get(height)
+        if entry is None or block_hash not in (None, entry[0]):
+            return None
+        return entry[1]
+
+    def record(self, height, block_hash, time):
+        self[height] = (block_hash, time)
+
+
+def test_block_times_are_cached(fake_dynamicd):
+    from dynamicd import DynamicDaemon
+    (host, port) = fake_dynamicd.server_address
+    fake_dynamicd.methods['getblockheader'] = lambda h: {'time': 1000 + int(h, 16)}
+    fake_dynamicd.methods['getblock'] = lambda h: {'time': 1000 + int(h, 16), 'tx': []}
+    store = BlockTimes()
+
+    dynamicd = DynamicDaemon(host=host, port=port, user='dynamicrpc', password='secret', block_time_store=store)
+    assert dynamicd.block_height_to_epoch(1) == 1001
+    assert store[1] == ('%064x' % 1, 1001)
+    dynamicd.refresh_chain_state()
+
+    # deep blocks are a local lookup
+    requests = fake_dynamicd.requests
+    assert dynamicd.block_height_to_epoch(1) == 1001
+    assert fake_dynamicd.requests == requests
+
+    # blocks near the tip are checked against the chain, e.g. after a reorg
+    store.record(95, 'f' * 64, 1)
+    assert dynamicd.block_height_to_epoch(95) == 1095
+    assert store[95] == ('%064x' % 95, 1095)
+
+    # falls back to getblock on daemons without getblockheader
+    del fake_dynamicd.methods['getblockheader']
+    assert dynamicd.block_height_to_epoch(96) == 1096
+    assert dynamicd.has_getblockheader is False
+
+
+def test_dynode_vin_memo(fake_dynamicd, dynamicd):
+    from dynamicd import NOT_FETCHED
+    vin = '%064x-1' % 7
+
+    def dynode(command, *args):
+        if command == 'status':
+            return {'vin': 'CTxIn(COutPoint(%064x, 1), scriptSig=)' % 7}
+        return 42
+
+    # a failed `dynode status` isn't remembered
+    del fake_dynamicd.methods['dynode']
+    assert dynamicd.get_current_dynode_vin() is None
+    assert dynamicd.dynode_vin is NOT_FETCHED
+
+    # nor is anything without a chain snapshot, e.g. in --daemon mode
+    fake_dynamicd.methods['dynode'] = dynode
+    assert dynamicd.get_current_dynode_vin() == vin
+    assert dynamicd.dynode_vin is NOT_FETCHED
+
+    dynamicd.refresh_chain_state()
+    assert dynamicd.get_current_dynode_vin() == vin
+    requests = fake_dynamicd.requests
+    assert dynamicd.get_current_dynode_vin() == vin
+    assert fake_dynamicd.requests == requests
+
+
+def test_failed_gobject_votes_are_memoized(fake_dynamicd, dynamicd):
+    fetched = []
+
+    def gobject(command, object_hash, txid, vout_index):
+        fetched.append(object_hash)
+        if object_hash == 'bad':
+            raise Exception('gobject not found')
+        return {}
+
+    def dynode(command, *args):
+        return {'vin': 'CTxIn(COutPoint(%064x, 1), scriptSig=)' % 7}
+
+    fake_dynamicd.methods['dynode'] = dynode
+    fake_dynamicd.methods['gobject'] = gobject
+    dynamicd.refresh_chain_state()
+
+    assert dynamicd.prefetch_my_gobject_votes(['good', 'bad']) == ['bad']
+    # neither is asked for again, one at a time
+    assert dynamicd.get_my_gobject_votes('bad') == []
+    assert dynamicd.get_my_gobject_votes('good') == []
+    assert sorted(fetched) == ['bad', 'good']
@@ -91,6 +91,58 @@ def test_invalid_dynamic_address():
     assert is_valid_dynamic_address(test, 'testnet') is False
 
 
+def test_validate_dynamic_addresses(monkeypatch):
+    import dynamiclib
+
+    main = valid_dynamic_address()
+    bad = invalid_dynamic_address()
+    dynamiclib.address_validity.entries.clear()
+
+    checked = []
+
+    def check_dynamic_address(address, network='mainnet'):
+        checked.append(address)
+        return address == main
+    monkeypatch.setattr(dynamiclib, 'check_dynamic_address', check_dynamic_address)
+
+    assert dynamiclib.validate_dynamic_addresses([main, bad, main, main]) == [True, False, True, True]
+    assert sorted(checked) == sorted([main, bad])
+    # the next superblock's list is answered from the memo
+    assert dynamiclib.validate_dynamic_addresses([bad, main]) == [False, True]
+    assert len(checked) == 2
+    assert dynamiclib.validate_dynamic_addresses([]) == []
+
+
+def test_base58():
+    import base58
+
+    assert base58.b58encode(b'o hai') == 'DYB3oMS'
+    assert base58.b58decode('DYB3oMS', 5) == b'o hai'
+    # leading zero bytes <=> leading 1s
+    assert base58.b58encode(b'\0\0\x01') == '112'
+    assert base58.b58decode('112') == b'\0\0\x01'
+    # 0, O, I and l aren't base58
+    assert base58.b58decode('1O1') is None
+    assert base58.get_bcaddress_version('15VjRaDX9zpbA8LVnbrCAFzrVzN7ixHNsC') == 0
+
+
+def test_address_validity_is_memoised():
+    import dynamiclib
+
+    main = valid_dynamic_address()
+    dynamiclib.address_validity.entries.clear()
+    assert dynamiclib.is_valid_dynamic_address(main) is True
+    assert dynamiclib.address_validity.get((main, 'mainnet')) is True
+    assert dynamiclib.address_validity.get((main, 'testnet')) is None
+
+    cache = dynamiclib.LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+
 def test_deterministic_dynode_elections(current_block_hash, dn_list):
     winner = elect_dn(block_hash=current_block_hash, dnlist=dn_list)
     assert winner == 'f68a2e5d64f4a9be7ff8d0fbd9059dcd3ce98ad7a19a9260d1d6709127ffac56-1'
@@ -109,6 +161,52 @@ def test_deterministic_dynode_elections(current_block_hash, dn_list):
     assert winner == '656695ed867e193490261bea74783f0a39329ff634a10a9fb6f131807eeca744-1'
 
 
+def test_dynode_election_ranking(current_block_hash, dn_list):
+    from dynamiclib import DynodeElection, hashit
+
+    election = DynodeElection()
+    vins = [dn.vin for dn in dn_list]
+    ranking = election.rank(current_block_hash, vins)
+    assert [vin for (vin, diff) in ranking][0] == election.winner(current_block_hash, vins)
+    assert [diff for (vin, diff) in ranking] == sorted(abs(hashit(vin) - hashit(current_block_hash)) for vin in vins)
+    assert len(election.rank(current_block_hash, vins, top=2)) == 2
+
+    # vin hashes are remembered, within reason
+    assert set(election.vin_hashes) == set(vins)
+    election.vin_hashes.update(('%064x-0' % i, i) for i in range(2000))
+    assert election.winner(current_block_hash, vins) == ranking[0][0]
+    assert set(election.vin_hashes) == set(vins)
+
+    assert election.winner(current_block_hash, []) is None
+
+
+def test_dynode_list(dn_list):
+    from dynode import DynodeList
+    from dynamiclib import elect_dn
+
+    dynodelist_full = dict((dn.vin, '  %s %d %s %d %d %d 1 %s' % (dn.status, dn.protocol, dn.address, dn.lastseen, dn.activeseconds, dn.lastpaid, dn.ip_port))
+                           for dn in dn_list)
+    dynodelist_full['0d4c5a0eb2bc9c19aee1a5cc5d4ff8c27d1df4e6c6bd94b4c9ba0a0cdd8fd4c2-0'] = \
+        '  NEW_START_REQUIRED 70201 yepN97UoBLoP2hzWnwWGRVTcWtw1niKwcB 1474157704 0 0 0 1.2.3.4:19999'
+    dynodes = DynodeList.from_dynodelist(dynodelist_full)
+    assert len(dynodes) == 4
+
+    dn = [dn for dn in dynodes if dn.txid == 'f68a2e5d64f4a9be7ff8d0fbd9059dcd3ce98ad7a19a9260d1d6709127ffac56'][0]
+    assert dn.vin == 'f68a2e5d64f4a9be7ff8d0fbd9059dcd3ce98ad7a19a9260d1d6709127ffac56-1'
+    assert (dn.vout_index, dn.status, dn.protocol) == (1, 'ENABLED', 70201)
+    assert (dn.lastseen, dn.activeseconds, dn.lastpaid) == (1474157732, 1590425, 1474155175)
+    assert dn.ip_port == '[2604:a880:800:a1::9b:0]:19999'
+    assert dynodes[-1].vin == dynodes[3].vin
+    assert sorted(dynodes.vins_with_status('ENABLED')) == sorted(dn.vin for dn in dn_list)
+
+    # views don't carry a __dict__
+    with pytest.raises(AttributeError):
+        dn.foo = 1
+
+    winner = elect_dn(block_hash='00000056bcd579fa3dc9a1ee41e8124a4891dcf2661aa3c07cc582bfb63b52b9', dnlist=dynodes)
+    assert winner == '656695ed867e193490261bea74783f0a39329ff634a10a9fb6f131807eeca744-1'
+
+
 def test_parse_dynode_status_vin():
     from dynamiclib import parse_dynode_status_vin
     status = dn_status_good()
@@ -120,6 +218,28 @@ def test_parse_dynode_status_vin():
     assert vin is None
 
 
+def test_parse_raw_votes_bulk():
+    from dynamiclib import parse_raw_votes, parse_raw_votes_bulk
+    outpoint = dn_status_good()['vin']
+    raw_votes_by_hash = {
+        'aa' * 32: {'v1': '%s:1484000000:YES:FUNDING' % outpoint, 'v2': '%s:1484000001:No:Valid' % outpoint},
+        'bb' * 32: {},
+    }
+
+    votes = parse_raw_votes_bulk(raw_votes_by_hash)
+    assert votes['bb' * 32] == []
+    assert sorted(votes['aa' * 32], key=lambda v: v['ntime']) == [
+        {'dn_collateral_outpoint': 'f68a2e5d64f4a9be7ff8d0fbd9059dcd3ce98ad7a19a9260d1d6709127ffac56-1',
+         'signal': 'funding', 'outcome': 'yes', 'ntime': '1484000000'},
+        {'dn_collateral_outpoint': 'f68a2e5d64f4a9be7ff8d0fbd9059dcd3ce98ad7a19a9260d1d6709127ffac56-1',
+         'signal': 'valid', 'outcome': 'no', 'ntime': '1484000001'},
+    ]
+
+    # same answer as one object at a time
+    for (object_hash, raw_votes) in raw_votes_by_hash.items():
+        assert sorted(parse_raw_votes(raw_votes), key=lambda v: v['ntime']) == sorted(votes[object_hash], key=lambda v: v['ntime'])
+
+
 def test_hash_function():
     import dynamiclib
     sb_data_hex = '5b227375706572626c6f636b222c207b226576656e745f626c6f636b5f686569676874223a2037323639362c20227061796d656e745f616464726573736573223a2022795965384b77796155753559737753596d42337133727978385854557539793755697c795965384b77796155753559737753596d4233713372797838585455753979375569222c20227061796d656e745f616d6f756e7473223a202232352e37353030303030307c32352e3735303030303030227d5d'
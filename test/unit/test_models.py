@@ -55,8 +55,40 @@ def test_governance_object(governance_object):
         'no_count',
         'abstain_count',
         'absolute_yes_count',
+        'object_fingerprint',
     ]
 
     fields.sort()
     sorted_keys = sorted(d.keys())
     assert sorted_keys == fields
+
+
+def test_dynode_registry():
+    from models import DynodeEntry, DynodeRegistry
+    DynodeEntry.delete().execute()
+    registry = DynodeRegistry()
+
+    dnlist = {
+        'aa-1': '  ENABLED 70201 yjaFS6dudxUTxYPTDB9BYd1Nv4vMJXm3vK 1474157572 82842 1474152618 71111 52.90.74.124:19999',
+        'bb-1': '  ENABLED 70201 yUuAsYCnG5XrjgsGvRwcDqPhgLUnzNfe8L 1474157732 1590425 1474155175 71122 1.2.3.4:19999',
+    }
+    (added, removed, changed) = registry.sync(dnlist)
+    assert (sorted(added), removed, changed) == (['aa-1', 'bb-1'], [], [])
+    assert DynodeEntry.select().count() == 2
+
+    # a ping only moves lastseen, nothing to store
+    dnlist['aa-1'] = dnlist['aa-1'].replace('1474157572', '1474157900')
+    assert registry.sync(dnlist) == ([], [], [])
+
+    dnlist['bb-1'] = dnlist['bb-1'].replace('ENABLED', 'EXPIRED')
+    del dnlist['aa-1']
+    dnlist['cc-01'] = '  ENABLED 70201 yepN97UoBLoP2hzWnwWGRVTcWtw1niKwcB 1474157704 824622 1474152571 71110 5.6.7.8:19999'
+    assert registry.sync(dnlist) == (['cc-1'], ['aa-1'], ['bb-1'])
+    assert DynodeEntry.get(DynodeEntry.vin == 'bb-1').status == 'EXPIRED'
+
+    # answered from the table by a fresh registry, e.g. the next run
+    registry = DynodeRegistry()
+    assert registry.enabled_vins() == ['cc-1']
+    assert registry.is_enabled('cc-1')
+    assert not registry.is_enabled('bb-1')
+    assert not registry.is_enabled('aa-1')
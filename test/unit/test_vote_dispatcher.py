@@ -0,0 +1,205 @@
+import pytest
+import sys
+import os
+os.environ['SENTINEL_ENV'] = 'test'
+os.environ['SENTINEL_CONFIG'] = os.path.normpath(os.path.join(os.path.dirname(__file__), '../test_sentinel.conf'))
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../../lib')))
+import misc
+from models import GovernanceObject, Vote, PendingVote, Setting, VoteSignals, VoteOutcomes
+from models import NETWORK_VOTES_SYNCED
+from vote_dispatcher import VoteDispatcher
+from bitcoinrpc.authproxy import JSONRPCException
+
+SUCCESS = {'overall': 'Voted successfully', 'detail': {'dynamic.conf': {'result': 'success'}}}
+RATE_LIMITED = {'overall': 'Voted successfully 0 time(s) and failed 1 time(s).',
+                'detail': {'dynamic.conf': {'result': 'failed',
+                                            'errorMessage': 'Dynode voting too often, vote rejected'}}}
+
+
+class VotingDynamicd(object):
+    concurrency = 1
+
+    def __init__(self):
+        # object_hash => vote-conf output, or exception to raise
+        self.outputs = {}
+        # object_hash => our votes on the network
+        self.network_votes = {}
+        # object_hashes the network couldn't give votes for
+        self.failed_votes = []
+        self.dynode_vin = '%064x-1' % 7
+        self.commands = []
+
+    def concurrent(self):
+        return None
+
+    def rpc_command(self, *params):
+        self.commands.append(params)
+        output = self.outputs.get(params[2], SUCCESS)
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+    def get_current_dynode_vin(self):
+        return self.dynode_vin
+
+    def prefetch_my_gobject_votes(self, object_hashes):
+        return [h for h in object_hashes if h in self.failed_votes]
+
+    def get_my_gobject_votes(self, object_hash):
+        return self.network_votes.get(object_hash, [])
+
+
+@pytest.fixture
+def govobjs():
+    PendingVote.delete().execute()
+    Vote.delete().execute()
+    GovernanceObject.delete().execute()
+    return [GovernanceObject.create(object_hash='%064x' % (i + 1)) for i in range(3)]
+
+
+# ========================================================================
+
+
+def test_dispatch(govobjs):
+    dynamicd = VotingDynamicd()
+    dispatcher = VoteDispatcher(dynamicd)
+
+    for govobj in govobjs:
+        dispatcher.enqueue(govobj, VoteSignals.funding, VoteOutcomes.yes)
+    # queued once per object/signal
+    dispatcher.enqueue(govobjs[0], VoteSignals.funding, VoteOutcomes.yes)
+    assert PendingVote.select().count() == 3
+
+    dispatcher.dispatch()
+    assert len(dynamicd.commands) == 3
+    assert PendingVote.select().count() == 0
+    assert all(govobj.voted_on(signal=VoteSignals.funding, outcome=VoteOutcomes.yes) for govobj in govobjs)
+
+    # votes already recorded aren't queued again
+    dispatcher.enqueue(govobjs[0], VoteSignals.funding, VoteOutcomes.yes)
+    assert PendingVote.select().count() == 0
+
+
+def test_rate_limited_vote_is_retried_later(govobjs):
+    dynamicd = VotingDynamicd()
+    dispatcher = VoteDispatcher(dynamicd, retry_delay=60)
+    govobj = govobjs[0]
+
+    dynamicd.outputs[govobj.object_hash] = RATE_LIMITED
+    dispatcher.enqueue(govobj, VoteSignals.valid, VoteOutcomes.yes)
+    dispatcher.dispatch()
+
+    pending = PendingVote.get()
+    assert pending.attempts == 1
+    assert pending.next_attempt_at > misc.now()
+    assert not govobj.voted_on(signal=VoteSignals.valid)
+
+    # the queue survives (e.g. to the next run), but isn't due yet
+    VoteDispatcher(dynamicd).dispatch()
+    assert len(dynamicd.commands) == 1
+
+    # once due, the network turns out to have our vote
+    PendingVote.update(next_attempt_at=0).execute()
+    dynamicd.network_votes[govobj.object_hash] = [{'signal': 'valid', 'outcome': 'yes'}]
+    VoteDispatcher(dynamicd).dispatch()
+    assert PendingVote.select().count() == 0
+    assert govobj.voted_on(signal=VoteSignals.valid, outcome=VoteOutcomes.yes)
+
+
+def test_failed_vote_gives_up(govobjs):
+    dynamicd = VotingDynamicd()
+    dispatcher = VoteDispatcher(dynamicd, max_attempts=2)
+    govobj = govobjs[0]
+
+    dynamicd.outputs[govobj.object_hash] = JSONRPCException({'code': -8, 'message': 'Invalid vote signal'})
+    dispatcher.enqueue(govobj, VoteSignals.delete, VoteOutcomes.yes)
+    dispatcher.dispatch()
+    assert PendingVote.get().attempts == 1
+
+    PendingVote.update(next_attempt_at=0).execute()
+    dispatcher.dispatch()
+    assert PendingVote.select().count() == 0
+    assert not govobj.voted_on(signal=VoteSignals.delete)
+
+
+def test_changed_outcome_replaces_queued_vote(govobjs):
+    dispatcher = VoteDispatcher(VotingDynamicd())
+    govobj = govobjs[0]
+
+    dispatcher.enqueue(govobj, VoteSignals.funding, VoteOutcomes.yes)
+    PendingVote.update(attempts=3, next_attempt_at=misc.now() + 600).execute()
+
+    dispatcher.enqueue(govobj, VoteSignals.funding, VoteOutcomes.no)
+    pending = PendingVote.get()
+    assert pending.outcome == VoteOutcomes.no
+    assert (pending.attempts, pending.next_attempt_at) == (0, 0)
+
+
+def test_recorded_outcome_drops_stale_queued_vote(govobjs):
+    dynamicd = VotingDynamicd()
+    dispatcher = VoteDispatcher(dynamicd)
+    govobj = govobjs[0]
+
+    dispatcher.enqueue(govobj, VoteSignals.funding, VoteOutcomes.no)
+    Vote.create(governance_object=govobj, signal=VoteSignals.funding, outcome=VoteOutcomes.yes,
+                object_hash=govobj.object_hash)
+
+    # we've since decided yes, which is already recorded
+    dispatcher.enqueue(govobj, VoteSignals.funding, VoteOutcomes.yes)
+    assert PendingVote.select().count() == 0
+
+    dispatcher.dispatch()
+    assert dynamicd.commands == []
+    assert govobj.voted_on(signal=VoteSignals.funding, outcome=VoteOutcomes.yes)
+
+
+def test_sync_network_votes(govobjs):
+    dynamicd = VotingDynamicd()
+    dynamicd.network_votes = {
+        govobjs[0].object_hash: [{'signal': 'funding', 'outcome': 'yes'}, {'signal': 'valid', 'outcome': 'yes'}],
+        govobjs[1].object_hash: [{'signal': 'delete', 'outcome': 'no'}, {'signal': 'bogus', 'outcome': 'yes'}],
+    }
+    Vote.create(governance_object=govobjs[0], signal=VoteSignals.valid, outcome=VoteOutcomes.no,
+                object_hash=govobjs[0].object_hash)
+
+    assert GovernanceObject.sync_network_votes(dynamicd) == 2
+    assert govobjs[0].voted_on(signal=VoteSignals.funding, outcome=VoteOutcomes.yes)
+    assert govobjs[1].voted_on(signal=VoteSignals.delete, outcome=VoteOutcomes.no)
+    # a vote we already have locally is left alone
+    assert govobjs[0].voted_on(signal=VoteSignals.valid, outcome=VoteOutcomes.no)
+    assert Vote.select().count() == 3
+
+    assert GovernanceObject.sync_network_votes(dynamicd) == 0
+
+
+def test_network_votes_synced_once(govobjs):
+    Setting.delete().where(Setting.name == NETWORK_VOTES_SYNCED).execute()
+    dynamicd = VotingDynamicd()
+
+    # nothing to fetch before we're a dynode
+    dynamicd.dynode_vin = None
+    GovernanceObject.sync_network_votes(dynamicd)
+    assert not GovernanceObject.network_votes_synced()
+
+    # nor when the network couldn't give us all of our votes
+    dynamicd.dynode_vin = '%064x-1' % 7
+    dynamicd.failed_votes = [govobjs[1].object_hash]
+    GovernanceObject.sync_network_votes(dynamicd)
+    assert not GovernanceObject.network_votes_synced()
+
+    # a node that has never voted is done after one complete sync
+    dynamicd.failed_votes = []
+    assert GovernanceObject.sync_network_votes(dynamicd) == 0
+    assert Vote.select().count() == 0
+    assert GovernanceObject.network_votes_synced()
+
+
+def test_delete_votes_are_queued(govobjs):
+    dynamicd = VotingDynamicd()
+    dynamicd.outputs[govobjs[0].object_hash] = JSONRPCException({'code': -8, 'message': 'Invalid vote signal'})
+
+    # a failure doesn't abort the caller (e.g. the sync), the vote is retried later
+    GovernanceObject.vote_delete(dynamicd, govobjs[:2])
+    assert [pending.object_hash for pending in PendingVote.select()] == [govobjs[0].object_hash]
+    assert govobjs[1].voted_on(signal=VoteSignals.delete, outcome=VoteOutcomes.yes)
+    assert not govobjs[0].voted_on(signal=VoteSignals.delete)
@@ -0,0 +1,92 @@
+import pytest
+import sys
+import os
+import time
+os.environ['SENTINEL_CONFIG'] = os.path.normpath(os.path.join(os.path.dirname(__file__), '../test_sentinel.conf'))
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../../lib')))
+zmq = pytest.importorskip('zmq')
+from zmq_listener import ZMQListener
+
+
+# stands in for dynamicd's -zmqpub* publisher
+@pytest.fixture
+def publisher(request):
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    socket.setsockopt(zmq.LINGER, 0)
+    port = socket.bind_to_random_port('tcp://127.0.0.1')
+
+    def fin():
+        socket.close()
+        context.term()
+    request.addfinalizer(fin)
+
+    return (socket, 'tcp://127.0.0.1:%d' % port)
+
+
+def publish(publisher, topic, seq=0):
+    publisher[0].send_multipart([topic.encode('utf-8'), b'\x00' * 32, bytes(bytearray([seq, 0, 0, 0]))])
+
+
+@pytest.fixture
+def listener(request, publisher):
+    listener = ZMQListener(publisher[1], debounce=0.2, max_delay=1.0)
+    request.addfinalizer(listener.close)
+
+    # subscriptions take a moment to reach the publisher, anything sent
+    # before then is dropped
+    for i in range(50):
+        publish(publisher, 'hashblock')
+        if listener.wait(0.1):
+            break
+    else:
+        pytest.fail("listener never connected")
+
+    return listener
+
+
+# ========================================================================
+
+
+def test_wait_times_out(listener):
+    start = time.time()
+    assert listener.wait(0.2) == set()
+    assert time.time() - start >= 0.15
+
+
+def test_notifications_are_debounced(publisher, listener):
+    publish(publisher, 'hashblock')
+    for i in range(3):
+        publish(publisher, 'hashgovernanceobject', i)
+    publish(publisher, 'hashtx')
+
+    # one wake-up for the whole burst, unsubscribed topics filtered out
+    assert listener.wait(1) == set(['hashblock', 'hashgovernanceobject'])
+    assert listener.wait(0.3) == set()
+
+
+def test_max_delay_caps_debouncing(publisher, listener):
+    listener.debounce = 0.5
+    listener.max_delay = 0.3
+
+    publish(publisher, 'hashblock')
+    start = time.time()
+    assert listener.wait(1) == set(['hashblock'])
+    assert time.time() - start < 0.5
+
+
+def test_from_config(tmpdir):
+    dynamic_conf = tmpdir.join('dynamic.conf')
+    dynamic_conf.write("rpcuser=dynamicrpc\nzmqpubhashblock=tcp://127.0.0.1:28332\n")
+
+    listener = ZMQListener.from_config({}, str(dynamic_conf))
+    assert listener.address == 'tcp://127.0.0.1:28332'
+    listener.close()
+
+    listener = ZMQListener.from_config({'zmq_address': 'tcp://127.0.0.1:30000', 'zmq_debounce': '5'}, str(dynamic_conf))
+    assert listener.address == 'tcp://127.0.0.1:30000'
+    assert listener.debounce == 5
+    listener.close()
+
+    dynamic_conf.write("rpcuser=dynamicrpc\n")
+    assert ZMQListener.from_config({}, str(dynamic_conf)) is None